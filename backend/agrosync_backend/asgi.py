@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "agrosync_backend.settings")
+# GET list/retrieve run as coroutine views (api.asyncviews)
+os.environ.setdefault("API_ASYNC_VIEWS", "1")
 
 application = get_asgi_application()
@@ -43,8 +43,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "api.middleware.RequestMetricsMiddleware", # First, so it times everything below
     "django.middleware.security.SecurityMiddleware",
-    "whitenoise.middleware.WhiteNoiseMiddleware", # Add WhiteNoise here
+    "api.middleware.AsyncWhiteNoiseMiddleware", # WhiteNoise, without forcing ASGI requests into threads
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -78,7 +79,9 @@ WSGI_APPLICATION = "agrosync_backend.wsgi.application"
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
 import os
+from urllib.parse import urlsplit
 import dj_database_url
+from django.core.exceptions import ImproperlyConfigured
 
 # ==========================================
 # CONFIGURACIÓN DE BASE DE DATOS
@@ -98,13 +101,38 @@ if 'DATABASE_URL' in os.environ:
     DATABASES['default']['ENGINE'] = 'django.db.backends.postgresql'
 else:
     # Por defecto usa SQLite para desarrollo local si no hay DATABASE_URL
+    # SQLITE_PATH points it at another file (e.g. a benchmark dataset)
     DATABASES = {
         "default": {
             "ENGINE": "django.db.backends.sqlite3",
-            "NAME": BASE_DIR / "db.sqlite3",
+            "NAME": os.environ.get("SQLITE_PATH", BASE_DIR / "db.sqlite3"),
         }
     }
 
+# SQLITE_PROFILE=1 tunes SQLite for a server with concurrent writers (the
+# collection centers' scales). These PRAGMAs run on every new connection
+# (api.signals.configure_sqlite):
+#   busy_timeout         ms a writer waits for the lock before failing
+#   journal_mode=WAL     readers and the writer stop blocking each other
+#   synchronous=NORMAL   fsync at checkpoints instead of every commit; a
+#                        power cut can lose the last commits, never corrupt
+#   cache_size, mmap_size, temp_store   more of the file kept in memory
+# Transactions also take the write lock when they begin (IMMEDIATE): a
+# transaction that read first could otherwise fail at once, without waiting,
+# when it tried to write after another writer.
+SQLITE_PRAGMAS = {}
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3' and os.environ.get('SQLITE_PROFILE') == '1':
+    SQLITE_PRAGMAS = {
+        # First, so switching to WAL waits for other connections too
+        'busy_timeout': 10000,
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -64000,  # KiB
+        'mmap_size': 256 * 1024 * 1024,
+        'temp_store': 'MEMORY',
+    }
+    DATABASES['default']['OPTIONS'] = {'transaction_mode': 'IMMEDIATE'}
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -150,9 +178,78 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 CORS_ALLOW_ALL_ORIGINS = True # Allow all for now, or restrict to frontend URL in prod
 
+# Cached responses (api.cache). The version stamps that invalidate them are
+# in the database, so a cache private to each process (the default, and what
+# every serverless instance gets) never serves stale data; it only warms up
+# separately. CACHE_URL shares one cache between processes and hosts:
+# redis://host:6379/0 (needs the redis package) or file:///path/to/dir.
+def cache_from_url(url):
+    url = urlsplit(url)
+    if url.scheme in ("redis", "rediss"):
+        return {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": url.geturl()}
+    if url.scheme == "file":
+        return {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": url.path}
+    if url.scheme == "locmem":
+        return {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": url.netloc}
+    raise ImproperlyConfigured(f"Unsupported CACHE_URL scheme: {url.scheme!r}")
+
+
+CACHES = {"default": cache_from_url(os.environ.get("CACHE_URL", "locmem://"))}
+
+# Seconds a /api/reports/ response stays cached; writes invalidate it earlier
+REPORTS_CACHE_TIMEOUT = 60 * 60
+
+# Seconds the product, price and location catalogs stay cached; writes invalidate them earlier
+CATALOG_CACHE_TIMEOUT = 24 * 60 * 60
+
+# Days deletions are kept for ?since= syncs; older tokens must reload everything
+SYNC_TOMBSTONE_RETENTION_DAYS = 30
+
+# Background jobs (api.jobs). JOBS_EXECUTOR is 'thread' (web process thread
+# pool, after commit), 'eager' (at commit) or 'worker' (only `manage.py
+# run_jobs`). Retries and jobs stranded by a dead process are run by run_jobs,
+# and with 'thread' also by each web process every JOBS_POLL_SECONDS.
+# Serverless functions (Vercel, or any DATABASE_URL deployment) are frozen
+# between requests, so pool and sweeper threads there would stall: they
+# default to 'eager', and retries wait for a scheduled `run_jobs --once`.
+SERVERLESS = "VERCEL" in os.environ or "DATABASE_URL" in os.environ
+JOBS_EXECUTOR = os.environ.get('JOBS_EXECUTOR', 'eager' if SERVERLESS else 'thread')
+JOBS_THREADS = 2
+JOBS_MAX_ATTEMPTS = 5
+JOBS_RETRY_BASE_SECONDS = 10
+JOBS_RETRY_MAX_SECONDS = 60 * 60
+# Seconds after which a running job is assumed orphaned and requeued
+JOBS_LOCK_TIMEOUT = 10 * 60
+JOBS_POLL_SECONDS = 15
+
+# Seconds an authenticated user is reused without a query (api.authentication),
+# and how many users each process keeps
+AUTH_USER_CACHE_TIMEOUT = 60
+AUTH_USER_CACHE_SIZE = 1000
+
+# Async list/retrieve views (api.asyncviews). asgi.py turns this on; under
+# WSGI the views stay synchronous.
+API_ASYNC_VIEWS = os.environ.get('API_ASYNC_VIEWS') == '1'
+
+# api.middleware.RequestMetricsMiddleware logs this fraction of requests,
+# plus every request slower than PERF_SLOW_REQUEST_MS
+PERF_LOG_SAMPLE_RATE = 0.01
+PERF_SLOW_REQUEST_MS = 1000
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "api": {"handlers": ["console"], "level": os.environ.get("API_LOG_LEVEL", "INFO")},
+    },
+}
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.CachedJWTAuthentication',
     )
 }
 
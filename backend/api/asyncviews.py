@@ -0,0 +1,63 @@
+"""
+Async (ASGI) read path for the viewsets.
+
+With ``settings.API_ASYNC_VIEWS`` on (agrosync_backend/asgi.py turns it on),
+``as_view`` returns a coroutine view for the same URLs: GET list and
+retrieve run the viewset's ``alist``/``aretrieve`` on the event loop, which
+read through the ORM's async API and serialize in a worker thread. Every
+other action runs the regular synchronous view in a thread. Under WSGI
+(api/index.py, gunicorn) the views stay synchronous.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.views.decorators.csrf import csrf_exempt
+
+# Actions with an async variant: action name -> handler method
+ASYNC_ACTIONS = {'list': 'alist', 'retrieve': 'aretrieve'}
+
+
+class AsyncReadMixin:
+    @classmethod
+    def as_view(cls, actions=None, **initkwargs):
+        view = super().as_view(actions, **initkwargs)
+        if not settings.API_ASYNC_VIEWS or not set(actions.values()) & set(ASYNC_ACTIONS):
+            return view
+        sync_view = sync_to_async(view)
+
+        async def async_view(request, *args, **kwargs):
+            method = request.method.lower()
+            if method == 'head' and 'head' not in actions:
+                method = 'get'
+            action = actions.get(method)
+            if action not in ASYNC_ACTIONS:
+                return await sync_view(request, *args, **kwargs)
+            # What ViewSetMixin.as_view's view() does before dispatch()
+            self = cls(**initkwargs)
+            self.action_map = actions
+            for name, handler in actions.items():
+                setattr(self, name, getattr(self, handler))
+            self.request, self.args, self.kwargs = request, args, kwargs
+            return await self.adispatch(request, getattr(self, ASYNC_ACTIONS[action]), *args, **kwargs)
+
+        async_view.__name__ = view.__name__
+        async_view.__doc__ = view.__doc__
+        async_view.cls = cls
+        async_view.initkwargs = initkwargs
+        async_view.actions = actions
+        return csrf_exempt(async_view)
+
+    async def adispatch(self, request, handler, *args, **kwargs):
+        """APIView.dispatch() around an async handler"""
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+        try:
+            # Authentication loads the user from the database
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            response = await handler(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
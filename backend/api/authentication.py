@@ -0,0 +1,80 @@
+"""
+JWT authentication without a user query on every request.
+
+simplejwt's JWTAuthentication loads the User row for each request, so the
+SPA's seven parallel requests on start-up made seven identical lookups. Here
+resolved users are kept per process for ``AUTH_USER_CACHE_TIMEOUT`` seconds,
+keyed by user id. Saving or deleting a user drops it (api.signals): the
+change, e.g. a deactivation, applies at once in the process that made it,
+and within the timeout in the others.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import NotAuthenticated
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .cache import record_lookup
+
+_lock = threading.Lock()
+# user id -> (expiry, user), least recently used first
+_users = OrderedDict()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        now = time.monotonic()
+        with _lock:
+            expires, user = _users.get(user_id, (0, None))
+            if expires > now:
+                _users.move_to_end(user_id)
+            else:
+                user = None
+        record_lookup('auth:users', user is not None)
+
+        if user is None:
+            # Raises for unknown or inactive users, which are never cached
+            user = super().get_user(validated_token)
+            with _lock:
+                _users[user_id] = (now + settings.AUTH_USER_CACHE_TIMEOUT, user)
+                while len(_users) > settings.AUTH_USER_CACHE_SIZE:
+                    _users.popitem(last=False)
+        elif api_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+            api_settings.REVOKE_TOKEN_CLAIM
+        ) != get_md5_hash_password(user.password):
+            # Checked per token, so it can't be answered from the cache
+            raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+        # Requests must not share (and mutate) one instance
+        return copy.copy(user)
+
+
+def forget_user(user_id):
+    """Drop a user from this process's cache, e.g. after it was saved"""
+    with _lock:
+        _users.pop(user_id, None)
+
+
+def request_user_id(request):
+    """
+    Id of the authenticated user, read from the token's claim when there is
+    one. Raises NotAuthenticated for anonymous requests: their id is None,
+    and filter(user_id=None) would select the unowned legacy rows.
+    """
+    token = request.auth
+    if token is not None and api_settings.USER_ID_CLAIM in token:
+        return token[api_settings.USER_ID_CLAIM]
+    if not request.user.is_authenticated:
+        raise NotAuthenticated()
+    return request.user.id
@@ -0,0 +1,93 @@
+"""
+Version stamps for cached API data.
+
+Instead of deleting every cached entry that depends on a user's data, each
+(namespace, user) pair has an opaque version token that is part of the cache
+keys and of the list ETags. Bumping the version makes all old entries
+unreachable at once.
+
+The tokens are rows of the ``versiones`` table (api.models.Version), so every
+process and host reads the same ones whatever the cache backend, and a bump
+made inside a transaction becomes visible with the rows it describes: never
+before them, and not at all if the transaction rolls back. Tokens are random
+rather than counters, so a recreated database never repeats the token an
+older cached entry or ETag was made with.
+
+Lookups through ``get_or_build`` (or reported with ``record_lookup``) are
+counted per namespace; the counters are per process and reset on restart.
+"""
+import threading
+import uuid
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db.models import Q
+
+from .models import Version
+
+# Token of a (namespace, user) pair that was never bumped
+INITIAL_VERSION = '0'
+
+_stats_lock = threading.Lock()
+_stats = defaultdict(lambda: {'hits': 0, 'misses': 0})
+
+
+def _scope(namespace, user_id):
+    # Global catalogs (and rows with no known owner) are stored under user 0
+    return namespace, user_id or 0
+
+
+def current_version(namespace, user_id=None):
+    return current_versions([(namespace, user_id)])[0]
+
+
+def current_versions(scopes):
+    """Versions for several (namespace, user_id) pairs in one query."""
+    scopes = [_scope(*scope) for scope in scopes]
+    match = Q()
+    for namespace, user_id in set(scopes):
+        match |= Q(namespace=namespace, user_id=user_id)
+    found = {
+        (namespace, user_id): token
+        for namespace, user_id, token in Version.objects.filter(match).values_list('namespace', 'user_id', 'token')
+    }
+    return [found.get(scope, INITIAL_VERSION) for scope in scopes]
+
+
+def bump_version(namespace, user_id=None):
+    bump_versions([(namespace, user_id)])
+
+
+def bump_versions(scopes):
+    """New tokens for several (namespace, user_id) pairs in one upsert."""
+    # Sorted, so concurrent transactions lock the rows in the same order
+    rows = sorted({_scope(*scope) for scope in scopes})
+    Version.objects.bulk_create(
+        [Version(namespace=namespace, user_id=user_id, token=uuid.uuid4().hex[:12]) for namespace, user_id in rows],
+        update_conflicts=True,
+        unique_fields=['namespace', 'user_id'],
+        update_fields=['token'],
+    )
+
+
+def get_or_build(namespace, key, build, timeout):
+    """Return (cached value for ``key``, hit), calling ``build()`` on a miss."""
+    value = cache.get(key)
+    hit = value is not None
+    if not hit:
+        value = build()
+        cache.set(key, value, timeout)
+    record_lookup(namespace, hit)
+    return value, hit
+
+
+def record_lookup(namespace, hit):
+    """Count a cache lookup made outside get_or_build (see cache_stats)."""
+    with _stats_lock:
+        _stats[namespace]['hits' if hit else 'misses'] += 1
+
+
+def cache_stats():
+    """Hit/miss counters per namespace since this process started."""
+    with _stats_lock:
+        return {namespace: dict(counts) for namespace, counts in _stats.items()}
@@ -0,0 +1,99 @@
+"""
+Denormalized counters kept in step with delivery writes.
+
+Counters are only ever changed with relative F() updates, so concurrent
+writers never overwrite each other's increments. api.signals applies them on
+every save() and delete() of a delivery; bulk_create() sends no signals, so
+its callers apply them themselves. The management commands in
+``api/management/commands`` rebuild them from scratch if they drift. Every
+update also stamps ``updated_at`` so ``?since=`` syncs pick the change up.
+"""
+from collections import defaultdict
+
+from django.db.models import (
+    Case, Count, F, FloatField, IntegerField, OuterRef, Subquery, Sum, Value, When,
+)
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Delivery, Farmer, Warehouse
+
+# Deliveries in these states occupy space in their warehouse (see StoragePage)
+STORED_STATUSES = ('Almacenado', 'Completado')
+
+
+def stored_load(delivery):
+    """(warehouse_id, kg) that a delivery adds to warehouse occupancy."""
+    if delivery.warehouse_id and delivery.status in STORED_STATUSES:
+        return delivery.warehouse_id, delivery.weight or 0
+    return None, 0
+
+
+def apply_stored_change(before, after):
+    """Move occupancy from the ``before`` load to the ``after`` load."""
+    deltas = defaultdict(float)
+    if before[0]:
+        deltas[before[0]] -= before[1]
+    if after[0]:
+        deltas[after[0]] += after[1]
+    for warehouse_id, delta in deltas.items():
+        if delta:
+            Warehouse.objects.filter(pk=warehouse_id).update(
+                stored_kg=F('stored_kg') + delta, updated_at=timezone.now()
+            )
+
+
+def bump_farmer_deliveries(counts):
+    """Add ``counts[farmer_id]`` to each farmer's deliveries_count in one UPDATE."""
+    counts = {pk: n for pk, n in counts.items() if n}
+    if not counts:
+        return
+    delta = Case(
+        *[When(pk=pk, then=Value(n)) for pk, n in counts.items()],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+    Farmer.objects.filter(pk__in=counts).update(
+        deliveries_count=F('deliveries_count') + delta, updated_at=timezone.now()
+    )
+
+
+def farmer_delivery_drift():
+    """(farmer_id, stored count, actual count) for every farmer whose counter is off."""
+    return list(
+        Farmer.objects.annotate(actual=Count('delivery'))
+        .exclude(deliveries_count=F('actual'))
+        .order_by('pk')
+        .values_list('pk', 'deliveries_count', 'actual')
+    )
+
+
+def rebuild_farmer_deliveries(farmer_ids=None):
+    """Recompute deliveries_count (of ``farmer_ids``, or every farmer) in one UPDATE."""
+    actual = (
+        Delivery.objects.filter(farmer=OuterRef('pk'))
+        .order_by()
+        .values('farmer')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    farmers = Farmer.objects.all() if farmer_ids is None else Farmer.objects.filter(pk__in=farmer_ids)
+    return farmers.update(
+        deliveries_count=Coalesce(Subquery(actual, output_field=IntegerField()), Value(0)),
+        updated_at=timezone.now(),
+    )
+
+
+def rebuild_warehouse_occupancy():
+    """Recompute every warehouse's stored_kg in a single UPDATE."""
+    stored = (
+        Delivery.objects.filter(warehouse=OuterRef('pk'), status__in=STORED_STATUSES)
+        .order_by()
+        .values('warehouse')
+        .annotate(total=Sum('weight'))
+        .values('total')
+    )
+    return Warehouse.objects.update(
+        stored_kg=Coalesce(Subquery(stored, output_field=FloatField()), Value(0.0)),
+        updated_at=timezone.now(),
+    )
@@ -0,0 +1,50 @@
+"""
+Declarative list filters: ?status=&farmerId=&date_from=&ordering=...
+
+A viewset opts in with ``query_serializer_class``, a ListQuerySerializer
+subclass naming the allowed parameters. Values are validated (400 on bad
+input); parameters the serializer doesn't know are left to other features
+(limit, cursor, since, format). Every lookup is backed by an index, see the
+models' Meta.indexes.
+"""
+from datetime import timedelta
+
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+from .stats import start_of_day
+
+
+class QueryParamFilter(BaseFilterBackend):
+    def filter_queryset(self, request, queryset, view):
+        serializer_class = getattr(view, 'query_serializer_class', None)
+        # Detail routes look rows up by pk, unfiltered
+        if serializer_class is None or view.detail:
+            return queryset
+        params = serializer_class(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        query = params.validated_data
+
+        filters = {serializer_class.lookups[name]: query[name] for name in serializer_class.lookups if name in query}
+        field = serializer_class.date_field
+        # Half-open [from, to + 1 day) range so the indexes on date stay usable
+        if query.get('date_from'):
+            filters[f'{field}__gte'] = start_of_day(query['date_from'])
+        if query.get('date_to'):
+            filters[f'{field}__lt'] = start_of_day(query['date_to'] + timedelta(days=1))
+
+        delta_sync = getattr(view, 'delta_sync_class', None)
+        if filters and delta_sync and delta_sync.is_requested(request):
+            # A filtered delta couldn't report rows that left the filter
+            raise ValidationError({'since': ["Can't be combined with filters"]})
+        queryset = queryset.filter(**filters)
+
+        ordering = query.get('ordering')
+        if ordering:
+            keyset = getattr(view, 'keyset_pagination_class', None)
+            if keyset and keyset.is_requested(request):
+                raise ValidationError({'ordering': ["Cursor pages are always newest first"]})
+            descending = ordering.startswith('-')
+            name = serializer_class.orderings[ordering.lstrip('-')]
+            queryset = queryset.order_by(f'-{name}' if descending else name, '-pk' if descending else 'pk')
+        return queryset
@@ -0,0 +1,93 @@
+"""
+In-process gazetteer for the Department > Province > District catalog.
+
+Locations are read on every farmer/land request but almost never change, so
+the whole hierarchy is loaded once per process into two dicts:
+
+    (department, province, district) -> district id
+    district id -> (department, province, district)
+
+The index remembers the 'locations' version (api.cache) it was loaded at.
+The first lookup of each request compares that with the current version
+and reloads on a change, so a write made by another process shows up on
+the next request. In the writing process, the model signals in
+``api.signals`` also drop it at once.
+"""
+import threading
+
+from .cache import current_version
+from .models import District
+
+_lock = threading.Lock()
+# (version, by_names, by_id), or None until the first lookup
+_index = None
+# Whether this thread's current request already compared versions
+_checked = threading.local()
+
+
+def _load():
+    by_names, by_id = {}, {}
+    rows = District.objects.values_list(
+        'id', 'provincia__departamento__nombre', 'provincia__nombre', 'nombre'
+    )
+    for pk, department, province, district in rows:
+        by_names[(department, province, district)] = pk
+        by_id[pk] = (department, province, district)
+    return by_names, by_id
+
+
+def _get_index():
+    global _index
+    index = _index
+    if index is None or not getattr(_checked, 'done', False):
+        version = current_version('locations')
+        _checked.done = True
+        if index is None or index[0] != version:
+            with _lock:
+                index = (version, *_load())
+                _index = index
+    return index[1:]
+
+
+def revalidate(**kwargs):
+    """Make this thread's next lookup compare versions (on request_started)"""
+    _checked.done = False
+
+
+def resolve(department, province, district):
+    """Return the district id for the given names, or None if unknown."""
+    by_names, _ = _get_index()
+    return by_names.get((department, province, district))
+
+
+def names(district_id):
+    """Return (department, province, district) for a district id, or None."""
+    if district_id is None:
+        return None
+    _, by_id = _get_index()
+    return by_id.get(district_id)
+
+
+def tree():
+    """The whole catalog as nested departments > provinces > districts, by name."""
+    _, by_id = _get_index()
+    departments = {}
+    for pk, (department, province, district) in by_id.items():
+        departments.setdefault(department, {}).setdefault(province, []).append(
+            {'id': pk, 'name': district}
+        )
+    return [
+        {
+            'name': department,
+            'provinces': [
+                {'name': province, 'districts': sorted(districts, key=lambda d: d['name'])}
+                for province, districts in sorted(provinces.items())
+            ],
+        }
+        for department, provinces in sorted(departments.items())
+    ]
+
+
+def invalidate():
+    global _index
+    _index = None
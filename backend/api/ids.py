@@ -0,0 +1,76 @@
+"""
+Collision-free primary keys for models with string ids (Delivery).
+
+Values come from a row in ``IdSequence``. Instead of touching that row for
+every id, each process leases a block of ``block_size`` values at a time and
+hands them out from memory, so most allocations run no query at all. Unused
+values of a block are simply skipped when the process exits; ids are unique,
+not gapless.
+"""
+import threading
+from collections import deque
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+
+from .models import IdSequence
+
+
+class IdAllocator:
+    def __init__(self, name, prefix, block_size=100, start=1):
+        self.name = name
+        self.prefix = prefix
+        self.block_size = block_size
+        self.start = start
+        self._lock = threading.Lock()
+        self._ranges = deque()  # Leased [start, end) ranges not yet handed out
+
+    def allocate(self, count=1):
+        """Return ``count`` new ids, e.g. ['DEL-100000', 'DEL-100001']."""
+        values = []
+        with self._lock:
+            while self._ranges and len(values) < count:
+                start, end = self._ranges.popleft()
+                take = min(count - len(values), end - start)
+                values.extend(range(start, start + take))
+                if start + take < end:
+                    self._ranges.appendleft((start + take, end))
+
+        missing = count - len(values)
+        if missing:
+            start, end = self._lease(max(missing, self.block_size))
+            values.extend(range(start, start + missing))
+            leftover = (start + missing, end)
+            if leftover[0] < leftover[1]:
+                if connection.in_atomic_block:
+                    # The lease is only durable once the caller's transaction
+                    # commits; on rollback the leftover must not be reused.
+                    transaction.on_commit(lambda: self._release(leftover))
+                else:
+                    self._release(leftover)
+        return [f'{self.prefix}{value}' for value in values]
+
+    def _release(self, block):
+        with self._lock:
+            self._ranges.append(block)
+
+    def _lease(self, size):
+        with transaction.atomic():
+            updated = IdSequence.objects.filter(name=self.name).update(
+                next_value=F('next_value') + size
+            )
+            if not updated:
+                self._create_sequence()
+                IdSequence.objects.filter(name=self.name).update(next_value=F('next_value') + size)
+            end = IdSequence.objects.filter(name=self.name).values_list('next_value', flat=True).get()
+        return end - size, end
+
+    def _create_sequence(self):
+        try:
+            with transaction.atomic():
+                IdSequence.objects.create(name=self.name, next_value=self.start)
+        except IntegrityError:
+            pass  # Another worker created it first
+
+
+delivery_ids = IdAllocator('delivery', 'DEL-', start=100000)
@@ -0,0 +1,164 @@
+"""
+Durable background jobs for side effects that don't have to finish before
+the response (e.g. payment bookkeeping after quality control).
+
+``enqueue`` stores a ``Job`` row in the caller's transaction, so a job exists
+exactly when the write that caused it commits. Jobs are then started
+according to ``settings.JOBS_EXECUTOR``:
+
+* ``'thread'``: by a small thread pool in the web process, after commit;
+* ``'eager'``: synchronously at commit (tests, serverless deployments);
+* ``'worker'``: only by the ``run_jobs`` management command.
+
+Failed jobs are retried with exponential back-off, and jobs left running by a
+dead process are requeued. ``run_jobs`` picks both up; with ``'thread'``, so
+does a sweeper thread each web process starts on its first request, every
+``JOBS_POLL_SECONDS``. A job may run more than once, so handlers must be
+idempotent. Finished jobs are deleted.
+"""
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+_handlers = {}
+_executor = None
+_executor_lock = threading.Lock()
+_sweeper = None
+
+
+def job(name):
+    """Register the decorated function as the handler of jobs called ``name``."""
+    def register(func):
+        _handlers[name] = func
+        return func
+    return register
+
+
+def enqueue(name, **payload):
+    """Queue ``name(**payload)``; payload values must be JSON serializable."""
+    if name not in _handlers:
+        raise KeyError(f'No job handler registered for {name!r}')
+    pk = Job.objects.create(name=name, payload=payload, run_at=timezone.now()).pk
+    executor = settings.JOBS_EXECUTOR
+    if executor == 'eager':
+        transaction.on_commit(lambda: run(pk))
+    elif executor == 'thread':
+        transaction.on_commit(lambda: _get_executor().submit(run_in_thread, pk))
+    return pk
+
+
+def due_job_ids(limit):
+    """Ids of up to ``limit`` jobs ready to run, oldest first."""
+    now = timezone.now()
+    # Jobs whose worker died mid-run go back to the queue
+    Job.objects.filter(
+        status=Job.RUNNING, locked_at__lt=now - timedelta(seconds=settings.JOBS_LOCK_TIMEOUT)
+    ).update(status=Job.PENDING)
+    return list(
+        Job.objects.filter(status=Job.PENDING, run_at__lte=now)
+        .order_by('run_at', 'pk')
+        .values_list('pk', flat=True)[:limit]
+    )
+
+
+def run(pk):
+    """Claim and run one job. Returns False if another runner got it first."""
+    claimed = Job.objects.filter(pk=pk, status=Job.PENDING).update(
+        status=Job.RUNNING, locked_at=timezone.now(), attempts=F('attempts') + 1
+    )
+    if not claimed:
+        return False
+    instance = Job.objects.get(pk=pk)
+    try:
+        handler = _handlers[instance.name]
+        handler(**instance.payload)
+    except Exception as exc:
+        failed = instance.attempts >= settings.JOBS_MAX_ATTEMPTS
+        logger.exception(
+            "Job %s (%s) failed, attempt %s%s",
+            pk, instance.name, instance.attempts, ", giving up" if failed else "",
+        )
+        Job.objects.filter(pk=pk).update(
+            status=Job.FAILED if failed else Job.PENDING,
+            run_at=timezone.now() + retry_delay(instance.attempts),
+            last_error=f'{type(exc).__name__}: {exc}',
+        )
+    else:
+        Job.objects.filter(pk=pk).delete()
+    return True
+
+
+def run_in_thread(pk):
+    """run() for executor threads, which must close their own connection."""
+    try:
+        return run(pk)
+    except Exception:
+        logger.exception("Job runner crashed on job %s", pk)
+        return False
+    finally:
+        connection.close()
+
+
+def retry_delay(attempts):
+    """Exponential back-off with 10% jitter, capped at JOBS_RETRY_MAX_SECONDS."""
+    seconds = min(
+        settings.JOBS_RETRY_BASE_SECONDS * 2 ** (attempts - 1), settings.JOBS_RETRY_MAX_SECONDS
+    )
+    return timedelta(seconds=seconds * (1 + random.random() * 0.1))
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.JOBS_THREADS, thread_name_prefix='api-jobs'
+            )
+        return _executor
+
+
+def start_sweeper(**kwargs):
+    """
+    Start this process's sweeper thread once, when JOBS_EXECUTOR is 'thread'
+    (connected to request_started, so only web processes run one).
+    """
+    global _sweeper
+    if _sweeper is not None or settings.JOBS_EXECUTOR != 'thread':
+        return
+    with _executor_lock:
+        if _sweeper is not None:
+            return
+        _sweeper = threading.Thread(target=_sweep, name='api-jobs-sweeper', daemon=True)
+    _sweeper.start()
+
+
+def sweep():
+    """Hand due jobs (retries, jobs stranded by a dead process) to the thread pool"""
+    due = due_job_ids(settings.JOBS_THREADS * 4)
+    for pk in due:
+        # run() claims the job, so one also picked up elsewhere runs once
+        _get_executor().submit(run_in_thread, pk)
+    return due
+
+
+def _sweep():
+    while True:
+        time.sleep(settings.JOBS_POLL_SECONDS)
+        try:
+            sweep()
+        except Exception:
+            logger.exception("Job sweeper failed")
+        finally:
+            connection.close()
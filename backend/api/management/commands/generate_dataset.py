@@ -0,0 +1,43 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+from api.synthetic import generate
+
+
+class Command(BaseCommand):
+    help = (
+        "Add a seeded synthetic dataset for benchmarks. It only adds rows, so point "
+        "SQLITE_PATH (or DATABASE_URL) at a scratch database first."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', default='bench', help="Owner of the data (created if missing)")
+        parser.add_argument('--farmers', type=int, default=10000)
+        parser.add_argument('--deliveries', type=int, default=1000000)
+        parser.add_argument('--warehouses', type=int, default=5)
+        parser.add_argument('--max-lands', type=int, default=3, help="Lands per farmer: 1..N")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        user, created = User.objects.get_or_create(username=options['username'])
+        if created:
+            user.set_password(options['username'])
+            user.save()
+            self.stdout.write(f"Created user {user.username!r} (password: {user.username})")
+
+        start = time.perf_counter()
+        counts = generate(
+            user,
+            farmers=options['farmers'],
+            deliveries=options['deliveries'],
+            warehouses=options['warehouses'],
+            max_lands=options['max_lands'],
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+            log=self.stdout.write,
+        )
+        summary = ', '.join(f"{n} {name}" for name, n in counts.items())
+        self.stdout.write(self.style.SUCCESS(f"Created {summary} in {time.perf_counter() - start:.1f}s"))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.cache import bump_versions
+from api.counters import farmer_delivery_drift, rebuild_farmer_deliveries
+from api.models import Farmer
+
+
+class Command(BaseCommand):
+    help = "Recompute Farmer.deliveries_count from the deliveries and report the drift corrected"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Only report the drift")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            drift = farmer_delivery_drift()
+            for pk, stored, actual in drift:
+                self.stdout.write(f"Farmer {pk}: {stored} -> {actual} ({actual - stored:+d})")
+            if not drift:
+                self.stdout.write("No drift found")
+                return
+            if options['dry_run']:
+                return
+            farmer_ids = [pk for pk, _, _ in drift]
+            rebuild_farmer_deliveries(farmer_ids)
+            # Queryset updates send no signals: invalidate the owners' cached lists
+            owners = Farmer.objects.filter(pk__in=farmer_ids).order_by().values_list('user_id', flat=True).distinct()
+            bump_versions((name, user_id) for user_id in owners for name in ('farmers', 'reports'))
+        total = sum(abs(actual - stored) for _, stored, actual in drift)
+        self.stdout.write(self.style.SUCCESS(
+            f"Corrected {len(drift)} farmers ({total} deliveries of drift)"
+        ))
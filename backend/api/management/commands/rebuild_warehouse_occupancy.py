@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.cache import bump_versions
+from api.counters import rebuild_warehouse_occupancy
+from api.models import Warehouse
+
+
+class Command(BaseCommand):
+    help = "Recompute Warehouse.stored_kg from the stored deliveries"
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            updated = rebuild_warehouse_occupancy()
+            # Queryset updates send no signals: invalidate the owners' cached lists
+            owners = Warehouse.objects.order_by().values_list('user_id', flat=True).distinct()
+            bump_versions((name, user_id) for user_id in owners for name in ('warehouses', 'reports'))
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt occupancy for {updated} warehouses"))
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from api.cache import bump_versions
+from api.ids import delivery_ids
+from api.models import Delivery, Payment, Tombstone
+
+
+class Command(BaseCommand):
+    help = "Rename legacy '#NNNNN' delivery ids to allocator ids (DEL-...), keeping payments linked"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Only print the planned renames")
+
+    def handle(self, *args, **options):
+        owners = dict(Delivery.objects.filter(id__startswith='#').values_list('id', 'farmer__user_id'))
+        legacy = list(owners)
+        if not legacy:
+            self.stdout.write("No legacy delivery ids found")
+            return
+
+        renames = list(zip(legacy, delivery_ids.allocate(len(legacy))))
+        for old, new in renames:
+            self.stdout.write(f"{old} -> {new}")
+        if options['dry_run']:
+            return
+
+        # Foreign keys are deferred, so the pk and its references can move
+        # inside one transaction. Queryset updates skip the model signals,
+        # which is what we want: nothing but the id changes. Synced clients
+        # see the old id as deleted and the new one as changed; the version
+        # bumps make cached lists and ETags follow.
+        with transaction.atomic():
+            now = timezone.now()
+            for old, new in renames:
+                Delivery.objects.filter(pk=old).update(id=new, updated_at=now)
+                Payment.objects.filter(delivery_id=old).update(delivery_id=new, updated_at=now)
+            Tombstone.objects.bulk_create(
+                Tombstone(collection='delivery', object_id=old, user_id=owners[old]) for old, _ in renames
+            )
+            bump_versions(
+                (name, user_id) for user_id in set(owners.values()) for name in ('deliveries', 'payments', 'reports')
+            )
+        self.stdout.write(self.style.SUCCESS(f"Rewrote {len(renames)} delivery ids"))
@@ -0,0 +1,33 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.jobs import due_job_ids, run_in_thread
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs (api.jobs) on a thread pool, retrying failures with back-off"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=settings.JOBS_THREADS)
+        parser.add_argument('--poll', type=float, default=1.0, help="Seconds to wait when the queue is empty")
+        parser.add_argument('--once', action='store_true', help="Exit once no job is due")
+
+    def handle(self, *args, **options):
+        threads = options['threads']
+        done = 0
+        with ThreadPoolExecutor(max_workers=threads, thread_name_prefix='run-jobs') as pool:
+            try:
+                while True:
+                    batch = due_job_ids(threads * 4)
+                    if batch:
+                        done += sum(pool.map(run_in_thread, batch))
+                    elif options['once']:
+                        break
+                    else:
+                        time.sleep(options['poll'])
+            except KeyboardInterrupt:
+                self.stdout.write("Stopping, waiting for running jobs")
+        self.stdout.write(self.style.SUCCESS(f"Ran {done} jobs"))
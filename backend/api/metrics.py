@@ -0,0 +1,153 @@
+"""
+Per-request performance numbers and per-route latency histograms.
+
+``RequestMetricsMiddleware`` (api.middleware) creates a ``RequestMetrics`` for
+every request and makes it current while the request runs, so code deeper in
+the stack can add to it (``measure_serialization``). Finished requests are
+folded into process-local histograms, served to staff at /api/_metrics/.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Upper bounds (ms) of the latency buckets; the last bucket is unbounded
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+_current = ContextVar('api_request_metrics', default=None)
+_lock = threading.Lock()
+_routes = {}
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+        self.render_time = 0.0
+
+    def record_query(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.queries += 1
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+
+def current():
+    """Metrics of the request being handled, or None outside a request."""
+    return _current.get()
+
+
+def record_query(execute, sql, params, many, context):
+    """Execute wrapper of every connection (see api.signals)"""
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    return metrics.record_query(execute, sql, params, many, context)
+
+
+@contextmanager
+def activate(metrics):
+    token = _current.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def measure_serialization():
+    """Count the enclosed Python time (minus SQL time) as serialization."""
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    start, db_before = time.perf_counter(), metrics.db_time
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        metrics.serialize_time += elapsed - (metrics.db_time - db_before)
+
+
+def serializing(func):
+    """``func`` counted as serialization, for running it in a thread (sync_to_async)"""
+    def wrapper(*args, **kwargs):
+        with measure_serialization():
+            return func(*args, **kwargs)
+    return wrapper
+
+
+class RouteStats:
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.queries = 0
+        self.db_ms = 0.0
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+
+    def add(self, duration_ms, metrics, status_code):
+        self.count += 1
+        self.errors += status_code >= 500
+        self.total_ms += duration_ms
+        self.max_ms = max(self.max_ms, duration_ms)
+        self.queries += metrics.queries
+        self.db_ms += metrics.db_time * 1000
+        self.buckets[bisect.bisect_left(BUCKETS_MS, duration_ms)] += 1
+
+    def percentile(self, fraction):
+        """Upper bound of the bucket holding the given percentile (None: above the last)"""
+        rank = fraction * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS_MS, self.buckets):
+            seen += count
+            if seen >= rank:
+                return bound
+        return None
+
+    def as_dict(self):
+        count = self.count or 1
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'avgMs': round(self.total_ms / count, 2),
+            'maxMs': round(self.max_ms, 2),
+            'p50Ms': self.percentile(0.5),
+            'p95Ms': self.percentile(0.95),
+            'p99Ms': self.percentile(0.99),
+            'avgQueries': round(self.queries / count, 2),
+            'avgDbMs': round(self.db_ms / count, 2),
+            'histogram': {
+                **{f'le_{bound}': n for bound, n in zip(BUCKETS_MS, self.buckets)},
+                'inf': self.buckets[-1],
+            },
+        }
+
+
+def record(route, duration_ms, metrics, status_code):
+    with _lock:
+        stats = _routes.get(route)
+        if stats is None:
+            stats = _routes[route] = RouteStats()
+        stats.add(duration_ms, metrics, status_code)
+
+
+def snapshot():
+    """Per-route statistics since this process started (or the last reset)."""
+    with _lock:
+        return {route: stats.as_dict() for route, stats in sorted(_routes.items())}
+
+
+def reset():
+    with _lock:
+        _routes.clear()
@@ -0,0 +1,121 @@
+import json
+import logging
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from . import metrics
+
+logger = logging.getLogger('api.performance')
+
+
+class RequestMetricsMiddleware:
+    """
+    Measures every request: SQL query count and time, serialization and
+    render time, total time and response size. Sent back in a Server-Timing
+    header, folded into api.metrics' per-route histograms and logged for a
+    sample of requests (always for slow ones). Queries are counted by the
+    execute wrapper api.signals installs on every connection.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request_metrics = metrics.RequestMetrics()
+        with metrics.activate(request_metrics):
+            response = self.get_response(request)
+        self.finish(request, response, request_metrics)
+        return response
+
+    async def __acall__(self, request):
+        request_metrics = metrics.RequestMetrics()
+        with metrics.activate(request_metrics):
+            response = await self.get_response(request)
+        self.finish(request, response, request_metrics)
+        return response
+
+    def process_template_response(self, request, response):
+        # Called just before DRF renders the response body
+        request_metrics = metrics.current()
+        if request_metrics is not None:
+            start = time.perf_counter()
+
+            def rendered(response):
+                request_metrics.render_time += time.perf_counter() - start
+
+            response.add_post_render_callback(rendered)
+        return response
+
+    def finish(self, request, response, request_metrics):
+        total_ms = request_metrics.elapsed * 1000
+        db_ms = request_metrics.db_time * 1000
+        serialize_ms = request_metrics.serialize_time * 1000
+        render_ms = request_metrics.render_time * 1000
+        size = None if response.streaming else len(response.content)
+
+        timings = [
+            f'db;dur={db_ms:.1f};desc="{request_metrics.queries} queries"',
+            f'ser;dur={serialize_ms:.1f}',
+            f'render;dur={render_ms:.1f}',
+            f'total;dur={total_ms:.1f}',
+        ]
+        if size is not None:
+            timings.append(f'size;desc="{size} B"')
+        response['Server-Timing'] = ', '.join(timings)
+
+        match = request.resolver_match
+        route = f'{request.method} {match.view_name if match else "unmatched"}'
+        metrics.record(route, total_ms, request_metrics, response.status_code)
+
+        slow = total_ms >= settings.PERF_SLOW_REQUEST_MS
+        if slow or random.random() < settings.PERF_LOG_SAMPLE_RATE:
+            logger.log(logging.WARNING if slow else logging.INFO, json.dumps({
+                'route': route,
+                'path': request.path,
+                'status': response.status_code,
+                'ms': round(total_ms, 1),
+                'queries': request_metrics.queries,
+                'dbMs': round(db_ms, 1),
+                'serializeMs': round(serialize_ms, 1),
+                'renderMs': round(render_ms, 1),
+                'bytes': size,
+            }))
+
+
+class AsyncWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise is sync-only, which under ASGI would run every request below
+    it in a thread. This keeps the chain async and only serves static files
+    in a thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
@@ -0,0 +1,38 @@
+# Generated by Django 5.1.4 on 2026-10-18 15:20
+
+from django.db import migrations, models
+from django.db.models import FloatField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_stored_kg(apps, schema_editor):
+    Delivery = apps.get_model("api", "Delivery")
+    Warehouse = apps.get_model("api", "Warehouse")
+    stored = (
+        Delivery.objects.filter(
+            warehouse=OuterRef("pk"), status__in=("Almacenado", "Completado")
+        )
+        .order_by()
+        .values("warehouse")
+        .annotate(total=Sum("weight"))
+        .values("total")
+    )
+    Warehouse.objects.update(
+        stored_kg=Coalesce(Subquery(stored, output_field=FloatField()), Value(0.0))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0002_farmer_user_warehouse_user"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="warehouse",
+            name="stored_kg",
+            field=models.FloatField(default=0),
+        ),
+        migrations.RunPython(backfill_stored_kg, migrations.RunPython.noop),
+    ]
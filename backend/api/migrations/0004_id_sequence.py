@@ -0,0 +1,43 @@
+# Generated by Django 5.1.4 on 2026-10-18 15:22
+
+import re
+
+from django.db import migrations, models
+
+# Legacy ids were DEL-1000..DEL-9999 (random) or #10000..#99999
+FIRST_DELIVERY_ID = 100000
+
+
+def seed_delivery_sequence(apps, schema_editor):
+    Delivery = apps.get_model("api", "Delivery")
+    IdSequence = apps.get_model("api", "IdSequence")
+    start = FIRST_DELIVERY_ID
+    for pk in Delivery.objects.values_list("pk", flat=True).iterator():
+        match = re.fullmatch(r"(?:DEL-|#)(\d+)", pk)
+        if match:
+            start = max(start, int(match.group(1)) + 1)
+    IdSequence.objects.update_or_create(name="delivery", defaults={"next_value": start})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0003_warehouse_stored_kg"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="IdSequence",
+            fields=[
+                (
+                    "name",
+                    models.CharField(max_length=50, primary_key=True, serialize=False),
+                ),
+                ("next_value", models.BigIntegerField()),
+            ],
+            options={
+                "db_table": "secuencias",
+            },
+        ),
+        migrations.RunPython(seed_delivery_sequence, migrations.RunPython.noop),
+    ]
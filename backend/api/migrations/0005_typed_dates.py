@@ -0,0 +1,139 @@
+# Generated by Django 5.1.4 on 2026-10-18 15:23
+
+from datetime import datetime, time, timezone
+
+from django.db import migrations, models
+from django.utils.dateparse import parse_date, parse_datetime
+
+BATCH_SIZE = 2000
+
+
+def parse_legacy_date(value):
+    """Parse the free-form strings the old CharFields held ('2025-01-31',
+    '2025-01-31T10:30', '2025-01-31 10:30:00', ...). Naive values are UTC."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        parsed = parse_datetime(value)
+        if parsed is None:
+            day = parse_date(value[:10])
+            parsed = datetime.combine(day, time.min) if day else None
+    except ValueError:
+        return None
+    if parsed is not None and parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def rewrite_in_batches(Model, fields, convert):
+    batch = []
+    for obj in Model.objects.only("pk", *fields).iterator(chunk_size=BATCH_SIZE):
+        convert(obj)
+        batch.append(obj)
+        if len(batch) >= BATCH_SIZE:
+            Model.objects.bulk_update(batch, fields)
+            batch = []
+    if batch:
+        Model.objects.bulk_update(batch, fields)
+
+
+def backfill_dates(apps, schema_editor):
+    now = datetime.now(timezone.utc)
+
+    def convert_delivery(obj):
+        obj.date_typed = parse_legacy_date(obj.date)
+        if obj.date_typed is None:
+            # Keep the unreadable original next to the delivery instead of losing it
+            obj.date_typed = now
+            obj.notes = "\n".join(filter(None, [obj.notes, f"Fecha original: {obj.date}"]))
+
+    def convert_payment(obj):
+        obj.date_typed = parse_legacy_date(obj.date)
+
+    rewrite_in_batches(
+        apps.get_model("api", "Delivery"), ["date", "date_typed", "notes"], convert_delivery
+    )
+    rewrite_in_batches(apps.get_model("api", "Payment"), ["date", "date_typed"], convert_payment)
+
+
+def restore_dates(apps, schema_editor):
+    def convert(obj):
+        obj.date = obj.date_typed.strftime("%Y-%m-%d %H:%M:%S") if obj.date_typed else None
+
+    for name in ("Delivery", "Payment"):
+        rewrite_in_batches(apps.get_model("api", name), ["date", "date_typed"], convert)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0004_id_sequence"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="delivery",
+            name="date_typed",
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AddField(
+            model_name="payment",
+            name="date_typed",
+            field=models.DateTimeField(null=True),
+        ),
+        # Nullable while both columns exist, so the migration can be reversed
+        migrations.AlterField(
+            model_name="delivery",
+            name="date",
+            field=models.CharField(max_length=50, null=True),
+        ),
+        migrations.RunPython(backfill_dates, restore_dates),
+        migrations.RemoveField(
+            model_name="delivery",
+            name="date",
+        ),
+        migrations.RemoveField(
+            model_name="payment",
+            name="date",
+        ),
+        migrations.RenameField(
+            model_name="delivery",
+            old_name="date_typed",
+            new_name="date",
+        ),
+        migrations.RenameField(
+            model_name="payment",
+            old_name="date_typed",
+            new_name="date",
+        ),
+        migrations.AlterField(
+            model_name="delivery",
+            name="date",
+            field=models.DateTimeField(),
+        ),
+        migrations.AddIndex(
+            model_name="delivery",
+            index=models.Index(fields=["date", "id"], name="entregas_date_id_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="delivery",
+            index=models.Index(fields=["farmer", "date"], name="entregas_farmer_date_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="delivery",
+            index=models.Index(fields=["status", "date"], name="entregas_status_date_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="delivery",
+            index=models.Index(fields=["warehouse", "status"], name="entregas_wh_status_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="payment",
+            index=models.Index(fields=["date", "id"], name="pagos_date_id_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="payment",
+            index=models.Index(fields=["delivery", "date"], name="pagos_delivery_date_idx"),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.1.4 on 2026-10-18 16:16
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0007_job_queue"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="delivery",
+            index=models.Index(
+                fields=["land", "date"], name="entregas_land_date_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="farmer",
+            index=models.Index(
+                fields=["user", "status"], name="agricultores_user_status_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="farmer",
+            index=models.Index(
+                fields=["user", "name"], name="agricultores_user_name_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="payment",
+            index=models.Index(
+                fields=["status", "date"], name="pagos_status_date_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,88 @@
+# Generated by Django 5.1.4 on 2026-10-18 16:48
+
+from django.db import migrations
+
+# Indexed table -> searched columns (api.search)
+SEARCHED = {
+    "agricultores": ("name", "document"),
+    "terrenos": ("name", "location"),
+}
+
+
+def sqlite_statements(table, columns):
+    # A later migration that rebuilds {table} (SQLite's ALTER fallback) drops
+    # these triggers with it; api.signals.repair_search_triggers recreates
+    # them after every migrate.
+    fts = f"{table}_fts"
+    names = ", ".join(columns)
+    new = ", ".join(f"new.{column}" for column in columns)
+    old = ", ".join(f"old.{column}" for column in columns)
+    delete = f"INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', old.id, {old});"
+    insert = f"INSERT INTO {fts}(rowid, {names}) VALUES (new.id, {new});"
+    return [
+        # External content table: the text stays in {table}, only the index is stored.
+        # remove_diacritics 2 folds accents; prefix= indexes 2 and 3 letter prefixes.
+        f"CREATE VIRTUAL TABLE {fts} USING fts5({names}, content='{table}', content_rowid='id', "
+        f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+        f"CREATE TRIGGER {fts}_insert AFTER INSERT ON {table} BEGIN {insert} END",
+        f"CREATE TRIGGER {fts}_delete AFTER DELETE ON {table} BEGIN {delete} END",
+        f"CREATE TRIGGER {fts}_update AFTER UPDATE OF {names} ON {table} BEGIN {delete} {insert} END",
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    ]
+
+
+def postgres_statements(table, columns):
+    # Same expression as api.search.SearchIndex.postgres_document
+    text = " || ' ' || ".join(f"coalesce(\"{column}\", '')" for column in columns)
+    return [
+        f"CREATE INDEX {table}_search_trgm_idx ON {table} "
+        f"USING gin (agrosync_unaccent(lower({text})) gin_trgm_ops)",
+    ]
+
+
+def create_search_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        statements = []
+        for table, columns in SEARCHED.items():
+            statements += sqlite_statements(table, columns)
+    elif vendor == "postgresql":
+        statements = [
+            "CREATE EXTENSION IF NOT EXISTS unaccent",
+            "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+            # unaccent() is only STABLE, which index expressions don't accept
+            "CREATE OR REPLACE FUNCTION agrosync_unaccent(text) RETURNS text "
+            "LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT "
+            "AS $$ SELECT public.unaccent('public.unaccent', $1) $$",
+        ]
+        for table, columns in SEARCHED.items():
+            statements += postgres_statements(table, columns)
+    else:
+        return
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def drop_search_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        for table in SEARCHED:
+            # Dropping the table drops nothing else: the triggers live on {table}
+            for trigger in ("insert", "delete", "update"):
+                schema_editor.execute(f"DROP TRIGGER IF EXISTS {table}_fts_{trigger}")
+            schema_editor.execute(f"DROP TABLE IF EXISTS {table}_fts")
+    elif vendor == "postgresql":
+        for table in SEARCHED:
+            schema_editor.execute(f"DROP INDEX IF EXISTS {table}_search_trgm_idx")
+        schema_editor.execute("DROP FUNCTION IF EXISTS agrosync_unaccent(text)")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0008_list_filter_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
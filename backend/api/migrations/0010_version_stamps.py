@@ -0,0 +1,38 @@
+# Generated by Django 5.1.4 on 2026-10-18 16:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0009_search_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Version",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("namespace", models.CharField(max_length=50)),
+                ("user_id", models.IntegerField(default=0)),
+                ("token", models.CharField(max_length=12)),
+            ],
+            options={
+                "db_table": "versiones",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("namespace", "user_id"), name="versiones_scope_uniq"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.4 on 2026-10-18 17:04
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0010_version_stamps"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="farmer",
+            index=models.Index(
+                fields=["user", "deliveries_count"], name="agricultores_user_deliv_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="land",
+            index=models.Index(
+                fields=["farmer", "name"], name="terrenos_farmer_name_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="land",
+            index=models.Index(
+                fields=["farmer", "area"], name="terrenos_farmer_area_idx"
+            ),
+        ),
+    ]
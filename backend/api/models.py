@@ -40,6 +40,7 @@ class Product(models.Model):
     name = models.CharField(max_length=100)
     variety = models.CharField(max_length=100, null=True, blank=True)
     status = models.CharField(max_length=50, default='Activo')
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         db_table = 'productos'
@@ -54,9 +55,15 @@ class Farmer(models.Model):
     zone = models.CharField(max_length=255, null=True, blank=True)
     status = models.CharField(max_length=50, default='Activo')
     deliveries_count = models.IntegerField(default=0, db_column='deliveries')
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         db_table = 'agricultores'
+        indexes = [
+            models.Index(fields=['user', 'status'], name='agricultores_user_status_idx'),
+            models.Index(fields=['user', 'name'], name='agricultores_user_name_idx'),
+            models.Index(fields=['user', 'deliveries_count'], name='agricultores_user_deliv_idx'),
+        ]
 
 class Land(models.Model):
     name = models.CharField(max_length=255)
@@ -68,9 +75,14 @@ class Land(models.Model):
     tipo_riego = models.ForeignKey(IrrigationType, on_delete=models.SET_NULL, null=True)
     product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True, db_column='productId')
     status = models.CharField(max_length=50, default='Activo')
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         db_table = 'terrenos'
+        indexes = [
+            models.Index(fields=['farmer', 'name'], name='terrenos_farmer_name_idx'),
+            models.Index(fields=['farmer', 'area'], name='terrenos_farmer_area_idx'),
+        ]
 
 class Warehouse(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
@@ -79,6 +91,9 @@ class Warehouse(models.Model):
     capacity = models.FloatField(null=True)
     location = models.CharField(max_length=255, null=True, blank=True)
     status = models.CharField(max_length=50, default='Activo')
+    # Kg of stored deliveries, kept up to date by api.counters
+    stored_kg = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         db_table = 'almacenes'
@@ -96,17 +111,26 @@ class Delivery(models.Model):
     price_per_kg = models.FloatField(null=True, blank=True)
     total_payment = models.FloatField(null=True, blank=True)
     status = models.CharField(max_length=50, default='Pendiente')
-    date = models.CharField(max_length=50)
+    date = models.DateTimeField()
     notes = models.TextField(null=True, blank=True)
     warehouse = models.ForeignKey(Warehouse, on_delete=models.SET_NULL, null=True, db_column='warehouseId')
     location_detail = models.CharField(max_length=255, null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         db_table = 'entregas'
+        indexes = [
+            models.Index(fields=['date', 'id'], name='entregas_date_id_idx'), # keyset pages
+            models.Index(fields=['farmer', 'date'], name='entregas_farmer_date_idx'),
+            models.Index(fields=['status', 'date'], name='entregas_status_date_idx'),
+            models.Index(fields=['warehouse', 'status'], name='entregas_wh_status_idx'),
+            models.Index(fields=['land', 'date'], name='entregas_land_date_idx'),
+        ]
 
 class Price(models.Model):
     quality = models.CharField(max_length=100, unique=True)
     price = models.FloatField()
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         db_table = 'precios'
@@ -114,10 +138,72 @@ class Price(models.Model):
 class Payment(models.Model):
     delivery = models.ForeignKey(Delivery, on_delete=models.CASCADE, db_column='deliveryId', null=True)
     amount = models.FloatField(null=True)
-    date = models.CharField(max_length=50, null=True)
+    date = models.DateTimeField(null=True)
     method = models.CharField(max_length=50, null=True)
     reference = models.CharField(max_length=100, null=True)
     status = models.CharField(max_length=50, default='Completado')
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         db_table = 'pagos'
+        indexes = [
+            models.Index(fields=['date', 'id'], name='pagos_date_id_idx'), # keyset pages
+            models.Index(fields=['delivery', 'date'], name='pagos_delivery_date_idx'),
+            models.Index(fields=['status', 'date'], name='pagos_status_date_idx'),
+        ]
+
+class IdSequence(models.Model):
+    # Backing counter for api.ids; workers lease blocks of values from it
+    name = models.CharField(max_length=50, primary_key=True)
+    next_value = models.BigIntegerField()
+
+    class Meta:
+        db_table = 'secuencias'
+
+class Tombstone(models.Model):
+    # Rows deleted from a synced collection, so ?since= clients can drop them
+    collection = models.CharField(max_length=50) # Model name, e.g. 'delivery'
+    object_id = models.CharField(max_length=50)
+    user_id = models.IntegerField(null=True) # Owner; null for global catalogs
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'eliminaciones'
+        indexes = [
+            models.Index(fields=['collection', 'user_id', 'deleted_at'], name='eliminaciones_sync_idx'),
+        ]
+
+class Job(models.Model):
+    # Background work queued by api.jobs and run by the run_jobs worker
+    PENDING = 'pending'
+    RUNNING = 'running'
+    FAILED = 'failed' # Out of attempts; finished jobs are deleted
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=20, default=PENDING, choices=[
+        (PENDING, PENDING), (RUNNING, RUNNING), (FAILED, FAILED),
+    ])
+    attempts = models.IntegerField(default=0)
+    run_at = models.DateTimeField() # Not picked up before this (retry back-off)
+    locked_at = models.DateTimeField(null=True)
+    last_error = models.TextField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'trabajos'
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='trabajos_due_idx'),
+        ]
+
+class Version(models.Model):
+    # Version stamps of cached API data (api.cache), shared by every process
+    namespace = models.CharField(max_length=50) # e.g. 'deliveries', 'reports'
+    user_id = models.IntegerField(default=0) # Owner; 0 for global catalogs
+    token = models.CharField(max_length=12)
+
+    class Meta:
+        db_table = 'versiones'
+        constraints = [
+            models.UniqueConstraint(fields=['namespace', 'user_id'], name='versiones_scope_uniq'),
+        ]
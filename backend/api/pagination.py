@@ -0,0 +1,114 @@
+import base64
+import json
+
+from django.db.models import F, Q
+from django.core.exceptions import ValidationError as DjangoValidationError
+from rest_framework.exceptions import ValidationError
+
+
+class KeysetPagination:
+    """
+    Keyset (cursor) pagination over a (field, pk) pair, newest first.
+
+    Unlike OFFSET pagination every page is a single indexed range scan, so
+    page 1000 costs the same as page 1. The cursor is an opaque token holding
+    the (field, pk) values of the last row sent to the client.
+    """
+    ordering_field = 'date'
+    cursor_query_param = 'cursor'
+    limit_query_param = 'limit'
+    default_limit = 50
+    max_limit = 500
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self):
+        self.next_cursor = None
+
+    @classmethod
+    def is_requested(cls, request):
+        params = request.query_params
+        return cls.cursor_query_param in params or cls.limit_query_param in params
+
+    def get_limit(self, request):
+        try:
+            limit = int(request.query_params[self.limit_query_param])
+        except (KeyError, ValueError):
+            return self.default_limit
+        if limit <= 0:
+            return self.default_limit
+        return min(limit, self.max_limit)
+
+    def paginate_queryset(self, queryset, request, row_position=None):
+        """
+        Rows of the requested page. ``row_position(row)`` returns a row's
+        (field, pk) pair; by default rows are model instances.
+        """
+        limit = self.get_limit(request)
+        rows = list(self.page_queryset(queryset, request, limit))
+        return self.trim_page(rows, limit, row_position)
+
+    async def apaginate_queryset(self, queryset, request, row_position=None):
+        """paginate_queryset() through the async ORM"""
+        limit = self.get_limit(request)
+        rows = [row async for row in self.page_queryset(queryset, request, limit)]
+        return self.trim_page(rows, limit, row_position)
+
+    def page_queryset(self, queryset, request, limit):
+        """The requested page plus one row, to tell whether there is a next page"""
+        field = self.ordering_field
+
+        # NULL dates (legacy payments) sort after every dated row.
+        queryset = queryset.order_by(F(field).desc(nulls_last=True), '-pk')
+
+        position = self.decode_cursor(request)
+        if position is not None:
+            try:
+                queryset = queryset.filter(self.after(*position))
+            except (TypeError, ValueError, DjangoValidationError):
+                # Well-formed, but not a date and pk of this collection
+                raise self.invalid_cursor()
+        return queryset[:limit + 1]
+
+    def trim_page(self, rows, limit, row_position):
+        field = self.ordering_field
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            if row_position is None:
+                self.next_cursor = self.encode_cursor(getattr(last, field), last.pk)
+            else:
+                self.next_cursor = self.encode_cursor(*row_position(last))
+        return rows
+
+    def after(self, value, pk):
+        """Filter selecting the rows that come strictly after (value, pk)."""
+        field = self.ordering_field
+        if value is None:
+            return Q(**{f'{field}__isnull': True, 'pk__lt': pk})
+        return (
+            Q(**{f'{field}__lt': value})
+            | Q(**{field: value, 'pk__lt': pk})
+            | Q(**{f'{field}__isnull': True})
+        )
+
+    def encode_cursor(self, value, pk):
+        if value is not None and not isinstance(value, str):
+            value = value.isoformat()
+        raw = json.dumps([value, pk], separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            value, pk = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        except (TypeError, ValueError):
+            raise self.invalid_cursor()
+        if not isinstance(pk, (int, str)) or not isinstance(value, (str, type(None))):
+            raise self.invalid_cursor()
+        return value, pk
+
+    def invalid_cursor(self):
+        return ValidationError({self.cursor_query_param: self.invalid_cursor_message})
@@ -0,0 +1,149 @@
+"""
+Read-only row projections for the large list endpoints.
+
+A projection builds the same dicts as a read serializer straight from
+``values_list()`` tuples, skipping model instances and DRF's per-field
+machinery. Each one must stay in step with the serializer it mirrors;
+``api.testing.assert_projection_parity`` checks that.
+"""
+from abc import ABC, abstractmethod
+
+from asgiref.sync import sync_to_async
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+
+
+class Projection(ABC):
+    """``columns`` are fetched with values_list(); ``build`` maps one tuple to a dict"""
+    columns = ()
+    # Every key ``build`` can return, in output order (CSV headers)
+    fields = ()
+    # Columns holding the (field, pk) keyset position, see KeysetPagination
+    position_columns = ('date', 'id')
+
+    def __init__(self):
+        field = serializers.DateTimeField()
+        # Resolved once per list instead of once per value, as the field does
+        self._timezone = field.default_timezone()
+        self._datetime = field.to_representation
+        self._fast_datetime = api_settings.DATETIME_FORMAT == ISO_8601 and self._timezone is not None
+        self._position = [self.columns.index(name) for name in self.position_columns]
+
+    def values(self, queryset):
+        return queryset.values_list(*self.columns)
+
+    def rows(self, queryset):
+        return self.build_all(self.values(queryset))
+
+    def iterate(self, queryset, chunk_size=2000):
+        """Like rows(), but streamed from the database ``chunk_size`` rows at a time"""
+        for row in self.values(queryset).iterator(chunk_size=chunk_size):
+            yield self.build(row)
+
+    async def arows(self, queryset):
+        """rows() through the async ORM; the dicts are built in a worker thread"""
+        # Not aiterator(): on Django 5.1 it runs values_list() queries on the event loop
+        tuples = [row async for row in self.values(queryset)]
+        return await sync_to_async(self.build_all, thread_sensitive=False)(tuples)
+
+    def build_all(self, tuples):
+        return [self.build(row) for row in tuples]
+
+    @abstractmethod
+    def build(self, row):
+        """The dict the mirrored serializer returns for one ``values_list()`` tuple"""
+
+    def position(self, row):
+        return tuple(row[index] for index in self._position)
+
+    def datetime(self, value):
+        """Same output as serializers.DateTimeField for aware values"""
+        if value is None:
+            return None
+        if not self._fast_datetime:
+            return self._datetime(value)
+        value = value.astimezone(self._timezone).isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+
+
+class DeliveryProjection(Projection):
+    """Mirrors DeliveryReadSerializer"""
+    columns = (
+        'id', 'warehouse__name', 'farmer__name', 'land__name', 'product__name', 'product__variety',
+        'product_state', 'weight_fresh', 'weight', 'conversion_factor', 'price_per_kg',
+        'total_payment', 'status', 'date', 'notes', 'location_detail', 'updated_at',
+        'land_id', 'warehouse_id', 'farmer_id', 'product_id',
+    )
+    fields = (
+        'id', 'buyer_name', 'farmer', 'landName', 'product', 'warehouseName', 'product_state',
+        'weight_fresh', 'weight', 'conversion_factor', 'price_per_kg', 'total_payment', 'status',
+        'date', 'notes', 'location_detail', 'updated_at', 'land', 'warehouse', 'warehouseId',
+        'farmerId', 'landId', 'productId',
+    )
+
+    def build(self, row):
+        (pk, warehouse_name, farmer_name, land_name, product_name, product_variety,
+         product_state, weight_fresh, weight, conversion_factor, price_per_kg,
+         total_payment, status, date, notes, location_detail, updated_at,
+         land_id, warehouse_id, farmer_id, product_id) = row
+        data = {
+            'id': pk,
+            'farmer': farmer_name,
+            'product': f"{product_name} {product_variety or ''}".strip() if product_id else None,
+            'product_state': product_state,
+            'weight_fresh': weight_fresh,
+            'weight': weight,
+            'conversion_factor': conversion_factor,
+            'price_per_kg': price_per_kg,
+            'total_payment': total_payment,
+            'status': status,
+            'date': self.datetime(date),
+            'notes': notes,
+            'location_detail': location_detail,
+            'updated_at': self.datetime(updated_at),
+            'land': land_id,
+            'warehouse': warehouse_id,
+            'warehouseId': warehouse_id,
+            'farmerId': farmer_id,
+            'landId': land_id,
+        }
+        # The serializer leaves out source='x.name' fields when x is null
+        if warehouse_id is not None:
+            data['buyer_name'] = data['warehouseName'] = warehouse_name
+        if land_id is not None:
+            data['landName'] = land_name
+        if product_id:
+            data['productId'] = product_id
+        return data
+
+
+class PaymentProjection(Projection):
+    """Mirrors PaymentSerializer"""
+    columns = (
+        'id', 'amount', 'date', 'method', 'reference', 'status', 'updated_at', 'delivery_id',
+        'delivery__farmer__name', 'delivery__farmer_id',
+    )
+    fields = (
+        'id', 'amount', 'date', 'method', 'reference', 'status', 'updated_at', 'delivery',
+        'farmerName', 'farmerId',
+    )
+
+    def build(self, row):
+        (pk, amount, date, method, reference, status, updated_at, delivery_id,
+         farmer_name, farmer_id) = row
+        data = {
+            'id': pk,
+            'amount': amount,
+            'date': self.datetime(date),
+            'method': method,
+            'reference': reference,
+            'status': status,
+            'updated_at': self.datetime(updated_at),
+            'delivery': delivery_id,
+        }
+        if delivery_id is not None:
+            data['farmerName'] = farmer_name
+            data['farmerId'] = farmer_id
+        return data
@@ -0,0 +1,143 @@
+"""
+Type-ahead search over farmers (name, DNI/RUC) and lands (name, location).
+
+SQLite: an FTS5 table per model (migration 0009), kept in sync by triggers
+so bulk inserts and update() calls are indexed too. A migration that rebuilds
+the model's table drops the triggers with it; ``repair_sqlite`` puts them
+back after every migrate (api.signals). The unicode61 tokenizer
+drops diacritics, so "perez" finds "Pérez", and every word of the query is
+matched as a prefix, best matches (bm25) first.
+
+PostgreSQL: a trigram GIN index over the unaccented, lower-cased text; every
+word must appear in it (substring rather than prefix), ordered by
+similarity. Other databases fall back to unindexed icontains.
+"""
+import re
+import unicodedata
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import Farmer, Land
+
+WORD = re.compile(r'\w+')
+
+
+def fold(text):
+    """Lower-case ``text`` without accents, as the indexes store it"""
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+
+class SearchIndex:
+    model = None
+    table = None
+    columns = ()
+    # SQL condition on the indexed table (alias t) restricting rows to one user
+    owner_condition = None
+    # ORM filter equivalent of owner_condition, for the fallback
+    owner_lookup = None
+
+    @property
+    def fts_table(self):
+        return f'{self.table}_fts'
+
+    def search(self, user_id, query, limit):
+        """Ids of the user's rows matching every word of ``query``, best first"""
+        words = [fold(word) for word in WORD.findall(query)]
+        if not words:
+            return []
+        if connection.vendor == 'sqlite':
+            return self._search_fts5(user_id, words, limit)
+        if connection.vendor == 'postgresql':
+            return self._search_trigram(user_id, words, limit)
+        return self._search_fallback(user_id, words, limit)
+
+    def _search_fts5(self, user_id, words, limit):
+        match = ' '.join('"{}"*'.format(word.replace('"', '""')) for word in words)
+        sql = (
+            f'SELECT t.id FROM {self.fts_table} JOIN {self.table} t ON t.id = {self.fts_table}.rowid '
+            f'WHERE {self.fts_table} MATCH %s AND {self.owner_condition} ORDER BY rank LIMIT %s'
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [match, user_id, limit])
+            return [row[0] for row in cursor.fetchall()]
+
+    def _search_trigram(self, user_id, words, limit):
+        document = self.postgres_document('t')
+        sql = (
+            f'SELECT t.id FROM {self.table} t '
+            f'WHERE {self.owner_condition} AND {document} LIKE ALL(%s) '
+            f'ORDER BY similarity({document}, %s) DESC, t.id LIMIT %s'
+        )
+        patterns = ['%{}%'.format(word.replace('\\', '\\\\').replace('%', r'\%').replace('_', r'\_'))
+                    for word in words]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [user_id, patterns, ' '.join(words), limit])
+            return [row[0] for row in cursor.fetchall()]
+
+    def _search_fallback(self, user_id, words, limit):
+        condition = Q(**{self.owner_lookup: user_id})
+        for word in words:
+            condition &= Q(*[Q(**{f'{column}__icontains': word}) for column in self.columns], _connector=Q.OR)
+        return list(self.model.objects.filter(condition).order_by('pk').values_list('pk', flat=True)[:limit])
+
+    def sqlite_triggers(self):
+        """trigger name -> CREATE TRIGGER statement, as in migration 0009"""
+        fts, names = self.fts_table, ', '.join(self.columns)
+        new = ', '.join(f'new.{column}' for column in self.columns)
+        old = ', '.join(f'old.{column}' for column in self.columns)
+        delete = f"INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', old.id, {old});"
+        insert = f'INSERT INTO {fts}(rowid, {names}) VALUES (new.id, {new});'
+        return {
+            f'{fts}_insert': f'CREATE TRIGGER {fts}_insert AFTER INSERT ON {self.table} BEGIN {insert} END',
+            f'{fts}_delete': f'CREATE TRIGGER {fts}_delete AFTER DELETE ON {self.table} BEGIN {delete} END',
+            f'{fts}_update': (
+                f'CREATE TRIGGER {fts}_update AFTER UPDATE OF {names} ON {self.table} '
+                f'BEGIN {delete} {insert} END'
+            ),
+        }
+
+    def repair_sqlite(self, connection):
+        """
+        Recreate missing sync triggers and re-index the table, which may have
+        changed without them. Returns the names of the recreated triggers.
+        """
+        triggers = self.sqlite_triggers()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = %s", [self.table]
+            )
+            missing = sorted(set(triggers) - {row[0] for row in cursor.fetchall()})
+            for name in missing:
+                cursor.execute(triggers[name])
+            if missing:
+                cursor.execute(f"INSERT INTO {self.fts_table}({self.fts_table}) VALUES ('rebuild')")
+        return missing
+
+    @classmethod
+    def postgres_document(cls, alias):
+        """The expression the trigram index covers (see migration 0009)"""
+        text = " || ' ' || ".join(f"coalesce({alias}.\"{column}\", '')" for column in cls.columns)
+        return f'agrosync_unaccent(lower({text}))'
+
+
+class FarmerSearch(SearchIndex):
+    model = Farmer
+    table = 'agricultores'
+    columns = ('name', 'document')
+    owner_condition = 't.user_id = %s'
+    owner_lookup = 'user_id'
+
+
+class LandSearch(SearchIndex):
+    model = Land
+    table = 'terrenos'
+    columns = ('name', 'location')
+    owner_condition = 't."farmerId" IN (SELECT id FROM agricultores WHERE user_id = %s)'
+    owner_lookup = 'farmer__user_id'
+
+
+farmers = FarmerSearch()
+lands = LandSearch()
+indexes = (farmers, lands)
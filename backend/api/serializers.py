@@ -1,7 +1,14 @@
+import logging
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.utils.functional import cached_property
 from rest_framework import serializers
 from .models import *
 from .auth_serializers import RegisterSerializer
-import random
+from . import gazetteer
+from .ids import delivery_ids
+
+logger = logging.getLogger(__name__)
 
 class DocumentTypeSerializer(serializers.ModelSerializer):
     class Meta:
@@ -57,14 +64,9 @@ class FarmerSerializer(serializers.ModelSerializer):
                 pass # Or raise validation error, but legacy might just skip
 
         if dept_name and prov_name and dist_name:
-             try:
-                 validated_data['distrito'] = District.objects.get(
-                     nombre=dist_name, 
-                     provincia__nombre=prov_name,
-                     provincia__departamento__nombre=dept_name
-                 )
-             except District.DoesNotExist:
-                 pass
+            distrito_id = gazetteer.resolve(dept_name, prov_name, dist_name)
+            if distrito_id:
+                validated_data['distrito_id'] = distrito_id
         
         return super().create(validated_data)
     
@@ -81,24 +83,18 @@ class FarmerSerializer(serializers.ModelSerializer):
                 pass
         
         if dept_name and prov_name and dist_name:
-            try:
-                instance.distrito = District.objects.get(
-                     nombre=dist_name, 
-                     provincia__nombre=prov_name,
-                     provincia__departamento__nombre=dept_name
-                 )
-            except District.DoesNotExist:
-                 pass
+            distrito_id = gazetteer.resolve(dept_name, prov_name, dist_name)
+            if distrito_id:
+                instance.distrito_id = distrito_id
                  
         return super().update(instance, validated_data)
         
     def to_representation(self, instance):
         data = super().to_representation(instance)
         # Add flattened location data if available (optional, but specific for frontend)
-        if instance.distrito:
-            data['district'] = instance.distrito.nombre
-            data['province'] = instance.distrito.provincia.nombre
-            data['department'] = instance.distrito.provincia.departamento.nombre
+        location = gazetteer.names(instance.distrito_id)
+        if location:
+            data['department'], data['province'], data['district'] = location
         if instance.tipo_documento:
             data['document_type'] = instance.tipo_documento.codigo
         return data
@@ -131,14 +127,9 @@ class LandSerializer(serializers.ModelSerializer):
         # Yes, if it maps to a field, validates it and puts it in validated_data as 'farmer'.
         
         if dept_name and prov_name and dist_name:
-             try:
-                 validated_data['distrito'] = District.objects.get(
-                     nombre=dist_name, 
-                     provincia__nombre=prov_name,
-                     provincia__departamento__nombre=dept_name
-                 )
-             except District.DoesNotExist:
-                 pass
+            distrito_id = gazetteer.resolve(dept_name, prov_name, dist_name)
+            if distrito_id:
+                validated_data['distrito_id'] = distrito_id
         
         if irr_name:
             try:
@@ -156,14 +147,9 @@ class LandSerializer(serializers.ModelSerializer):
         validated_data.pop('cacao_variety', None)
 
         if dept_name and prov_name and dist_name:
-            try:
-                instance.distrito = District.objects.get(
-                     nombre=dist_name, 
-                     provincia__nombre=prov_name,
-                     provincia__departamento__nombre=dept_name
-                 )
-            except District.DoesNotExist:
-                 pass
+            distrito_id = gazetteer.resolve(dept_name, prov_name, dist_name)
+            if distrito_id:
+                instance.distrito_id = distrito_id
         
         if irr_name:
             try:
@@ -179,10 +165,9 @@ class LandSerializer(serializers.ModelSerializer):
         if instance.product:
             data['cropName'] = instance.product.name
             data['cropVariety'] = instance.product.variety
-        if instance.distrito:
-            data['district'] = instance.distrito.nombre
-            data['province'] = instance.distrito.provincia.nombre
-            data['department'] = instance.distrito.provincia.departamento.nombre
+        location = gazetteer.names(instance.distrito_id)
+        if location:
+            data['department'], data['province'], data['district'] = location
         if instance.tipo_riego:
             data['irrigation_type'] = instance.tipo_riego.nombre
         
@@ -197,6 +182,21 @@ class WarehouseSerializer(serializers.ModelSerializer):
     class Meta:
         model = Warehouse
         fields = '__all__'
+        read_only_fields = ['stored_kg'] # Maintained by api.counters
+
+
+def new_delivery_id():
+    return delivery_ids.allocate()[0]
+
+class DeliveryDefaults:
+    """Fallback product/warehouse for deliveries that don't name one, loaded at most once"""
+    @cached_property
+    def product(self):
+        return Product.objects.first()
+
+    @cached_property
+    def warehouse(self):
+        return Warehouse.objects.first()
 
 
 class DeliverySerializer(serializers.ModelSerializer):
@@ -235,21 +235,20 @@ class DeliveryCreateSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id']
 
-    def create(self, validated_data):
+    def prepare(self, validated_data, defaults):
+        """Fill in defaults and derived weights, returning the model field values"""
         weight_input = validated_data.pop('weight')
         product_state = validated_data.get('product_state', 'seco')
         
         # If product is not provided, default to first product? 
         # Models says product can be null? 
-        if 'product' not in validated_data:
-             # Try to find a default product
-             p = Product.objects.first()
-             if p: validated_data['product'] = p
+        if 'product' not in validated_data and defaults.product:
+            validated_data['product'] = defaults.product
 
         # If warehouse is not provided?
-        if 'warehouse' not in validated_data:
-             w = Warehouse.objects.first() # Or handle as per logic (maybe user's warehouse?)
-             if w: validated_data['warehouse'] = w
+        # Or handle as per logic (maybe user's warehouse?)
+        if 'warehouse' not in validated_data and defaults.warehouse:
+            validated_data['warehouse'] = defaults.warehouse
 
         weight_dry = weight_input
         weight_fresh = None
@@ -261,18 +260,69 @@ class DeliveryCreateSerializer(serializers.ModelSerializer):
             weight_dry = weight_fresh * conversion_factor
             
         # Use DEL- prefix instead of # to avoid URL encoding/routing issues with hashtags
-        validated_data['id'] = f"DEL-{random.randint(1000, 9999)}"
+        if 'id' not in validated_data:
+            validated_data['id'] = new_delivery_id()
         validated_data['weight'] = weight_dry
         validated_data['weight_fresh'] = weight_fresh
         validated_data['conversion_factor'] = conversion_factor or 0.38
-        
-        # Update farmer delivery count
-        farmer = validated_data['farmer']
-        farmer.deliveries_count += 1
-        farmer.save()
-        
+        return validated_data
+
+    def create(self, validated_data):
+        validated_data = self.prepare(validated_data, DeliveryDefaults())
+        # Farmer.deliveries_count is updated by api.signals
         return super().create(validated_data)
 
+class PrefetchedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """PK field resolved from objects loaded once for a whole batch (context['prefetched'])"""
+    def to_internal_value(self, data):
+        prefetched = self.context.get('prefetched')
+        if prefetched is None:
+            return super().to_internal_value(data)
+        try:
+            return prefetched[self.field_name][self.queryset.model._meta.pk.to_python(data)]
+        except KeyError:
+            self.fail('does_not_exist', pk_value=data)
+        except (TypeError, ValueError, DjangoValidationError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+class DeliveryBulkItemSerializer(DeliveryCreateSerializer):
+    """One entry of POST /api/deliveries/bulk/, validated against prefetched relations"""
+    farmerId = PrefetchedPrimaryKeyRelatedField(
+        queryset=Farmer.objects.all(), source='farmer', write_only=True
+    )
+    landId = PrefetchedPrimaryKeyRelatedField(
+        queryset=Land.objects.all(), source='land', write_only=True
+    )
+    warehouseId = PrefetchedPrimaryKeyRelatedField(
+        queryset=Warehouse.objects.all(), source='warehouse', write_only=True, required=False, allow_null=True
+    )
+    productId = PrefetchedPrimaryKeyRelatedField(
+        queryset=Product.objects.all(), source='product', write_only=True, required=False
+    )
+
+    @classmethod
+    def prefetch(cls, items):
+        """Load every object referenced by ``items`` with one query per relation"""
+        prefetched = {}
+        for name, field in cls().fields.items():
+            if not isinstance(field, PrefetchedPrimaryKeyRelatedField):
+                continue
+            pk_field = field.queryset.model._meta.pk
+            ids = set()
+            for item in items:
+                if not isinstance(item, dict) or item.get(name) in (None, ''):
+                    continue
+                try:
+                    ids.add(pk_field.to_python(item[name]))
+                except (TypeError, DjangoValidationError):
+                    pass # Reported per item by to_internal_value
+            prefetched[name] = field.queryset.in_bulk(ids)
+        return prefetched
+
+    def build(self, defaults, delivery_id):
+        """Unsaved Delivery for this item, ready for bulk_create"""
+        return Delivery(**self.prepare(dict(self.validated_data, id=delivery_id), defaults))
+
 class DeliveryUpdateSerializer(serializers.ModelSerializer):
     # For quality control updates (status, price, notes, etc.)
     # We don't require the creation fields like farmerId, landId, weight
@@ -289,7 +339,7 @@ class DeliveryUpdateSerializer(serializers.ModelSerializer):
         ]
         
     def update(self, instance, validated_data):
-        print("DEBUG: DeliveryUpdateSerializer.update called")
+        logger.debug("DeliveryUpdateSerializer.update called for %s", instance.pk)
         try:
             # Handle weight/state calculation if changed
             # Check if we have the necessary data to recalculate
@@ -335,9 +385,9 @@ class DeliveryUpdateSerializer(serializers.ModelSerializer):
                     del validated_data['product_state']
 
             return super().update(instance, validated_data)
-        except Exception as e:
-            print(f"CRITICAL ERROR in DeliveryUpdateSerializer: {str(e)}")
-            raise e
+        except Exception:
+            logger.exception("DeliveryUpdateSerializer.update failed for %s", instance.pk)
+            raise
         
     def to_representation(self, instance):
         # We might want to return the full representation after update
@@ -365,8 +415,8 @@ class DeliveryReadSerializer(serializers.ModelSerializer):
         data['warehouseId'] = instance.warehouse_id
         data['farmerId'] = instance.farmer_id
         data['landId'] = instance.land_id
-        if instance.product:
-            data['productId'] = instance.product.id
+        if instance.product_id:
+            data['productId'] = instance.product_id
         return data
 
 class PaymentSerializer(serializers.ModelSerializer):
@@ -380,3 +430,76 @@ class PaymentSerializer(serializers.ModelSerializer):
              data['farmerName'] = instance.delivery.farmer.name
              data['farmerId'] = instance.delivery.farmer.id
         return data
+
+class DateRangeQuerySerializer(serializers.Serializer):
+    """?date_from=&date_to= query parameters, both days included"""
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+
+    def validate(self, attrs):
+        if attrs.get('date_from') and attrs.get('date_to') and attrs['date_from'] > attrs['date_to']:
+            raise serializers.ValidationError("date_from must be before date_to")
+        return attrs
+
+class ReportQuerySerializer(DateRangeQuerySerializer):
+    granularity = serializers.ChoiceField(choices=['month', 'week', 'day'], default='month')
+
+class ListQuerySerializer(DateRangeQuerySerializer):
+    """
+    Allowed list filters of a viewset (api.filters). ``lookups`` maps each
+    filter parameter to its ORM lookup, ``date_field`` is the field bounded
+    by date_from/date_to (None: no date range) and ``orderings`` maps the
+    ?ordering= values (descending with a leading '-') to fields. Only offer
+    orderings an index can serve (see the models' Meta.indexes).
+    """
+    ordering = serializers.ChoiceField(choices=[], required=False)
+
+    lookups = {}
+    date_field = None
+    orderings = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.date_field is None:
+            del self.fields['date_from'], self.fields['date_to']
+        self.fields['ordering'].choices = [
+            value for name in self.orderings for value in (name, f'-{name}')
+        ]
+
+class FarmerQuerySerializer(ListQuerySerializer):
+    status = serializers.CharField(required=False)
+
+    lookups = {'status': 'status'}
+    orderings = {'name': 'name', 'deliveries': 'deliveries_count', 'updated_at': 'updated_at'}
+
+class LandQuerySerializer(ListQuerySerializer):
+    farmerId = serializers.IntegerField(required=False)
+
+    lookups = {'farmerId': 'farmer_id'}
+    orderings = {'name': 'name', 'area': 'area', 'updated_at': 'updated_at'}
+
+class DeliveryQuerySerializer(ListQuerySerializer):
+    status = serializers.CharField(required=False)
+    farmerId = serializers.IntegerField(required=False)
+    warehouseId = serializers.IntegerField(required=False)
+    landId = serializers.IntegerField(required=False)
+
+    lookups = {
+        'status': 'status', 'farmerId': 'farmer_id', 'warehouseId': 'warehouse_id', 'landId': 'land_id',
+    }
+    date_field = 'date'
+    orderings = {'date': 'date'}
+
+class PaymentQuerySerializer(ListQuerySerializer):
+    status = serializers.CharField(required=False)
+    farmerId = serializers.IntegerField(required=False)
+    deliveryId = serializers.CharField(required=False)
+
+    lookups = {'status': 'status', 'farmerId': 'delivery__farmer_id', 'deliveryId': 'delivery_id'}
+    date_field = 'date'
+    orderings = {'date': 'date'}
+
+class SearchQuerySerializer(serializers.Serializer):
+    """?q=&limit= of the type-ahead search actions (api.search)"""
+    q = serializers.CharField(max_length=100, trim_whitespace=True)
+    limit = serializers.IntegerField(min_value=1, max_value=50, default=20)
@@ -0,0 +1,207 @@
+import sys
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.exceptions import ObjectDoesNotExist
+from django.core.signals import request_started
+from django.db import connections, transaction
+from django.db.backends.signals import connection_created
+from django.db.migrations.recorder import MigrationRecorder
+from django.db.models.signals import post_delete, post_migrate, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import authentication, gazetteer, jobs, metrics, search
+from .cache import bump_version, bump_versions
+from .counters import apply_stored_change, bump_farmer_deliveries, stored_load
+from .models import (
+    Delivery, Department, District, Farmer, Land, Payment, Price, Product, Province, Tombstone,
+    Warehouse,
+)
+
+
+def owner_id(instance):
+    """Id of the user owning a farmer, land, warehouse, delivery or payment (None if unknown)."""
+    if hasattr(instance, '_deleted_owner_id'):
+        return instance._deleted_owner_id
+    try:
+        if isinstance(instance, (Farmer, Warehouse)):
+            return instance.user_id
+        if isinstance(instance, Land):
+            return Farmer.objects.filter(pk=instance.farmer_id).values_list('user_id', flat=True).first()
+        if isinstance(instance, Delivery):
+            return instance.farmer.user_id
+        if isinstance(instance, Payment):
+            return Farmer.objects.filter(delivery=instance.delivery_id).values_list(
+                'user_id', flat=True
+            ).first()
+    except ObjectDoesNotExist:
+        pass
+    return None
+
+
+@receiver(post_save, sender=Department)
+@receiver(post_delete, sender=Department)
+@receiver(post_save, sender=Province)
+@receiver(post_delete, sender=Province)
+@receiver(post_save, sender=District)
+@receiver(post_delete, sender=District)
+def invalidate_gazetteer(sender, **kwargs):
+    gazetteer.invalidate()
+    # A reload racing the open transaction may still see the old rows
+    transaction.on_commit(gazetteer.invalidate)
+    bump_version('locations')
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    user_id = instance.pk
+    authentication.forget_user(user_id)
+    # A request racing the open transaction may cache the old row again
+    transaction.on_commit(lambda: authentication.forget_user(user_id))
+
+
+@receiver(post_save, sender=Farmer)
+@receiver(post_delete, sender=Farmer)
+@receiver(post_save, sender=Delivery)
+@receiver(post_delete, sender=Delivery)
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+def invalidate_reports(sender, instance, **kwargs):
+    user_id = owner_id(instance)
+    if user_id is not None:
+        bump_version('reports', user_id)
+
+
+@receiver(pre_save, sender=Delivery)
+def remember_counted_delivery(sender, instance, **kwargs):
+    # What the stored row counts for, before the save overwrites it
+    if instance._state.adding:
+        return
+    rows = Delivery.objects.filter(pk=instance.pk).only('farmer', 'warehouse', 'status', 'weight')
+    if transaction.get_connection().in_atomic_block:
+        # Row lock, so concurrent edits see each other's load
+        rows = rows.select_for_update()
+    instance._counted = rows.first()
+
+
+@receiver(post_save, sender=Delivery)
+def update_warehouse_space(sender, instance, created, **kwargs):
+    # Every save() through the ORM, not only the API's; bulk_create sends no
+    # signals, so DeliveryViewSet.bulk and api.synthetic count on their own
+    before = None if created else getattr(instance, '_counted', None)
+    if created or before is not None:
+        apply_stored_change(stored_load(before) if before else (None, 0), stored_load(instance))
+
+
+@receiver(post_delete, sender=Delivery)
+def release_warehouse_space(sender, instance, **kwargs):
+    # Also runs for deliveries removed by a cascading farmer delete
+    apply_stored_change(stored_load(instance), (None, 0))
+
+
+@receiver(post_save, sender=Delivery)
+def count_farmer_deliveries(sender, instance, created, **kwargs):
+    before = getattr(instance, '_counted', None)
+    if created:
+        bump_farmer_deliveries({instance.farmer_id: 1})
+    elif before is not None and before.farmer_id != instance.farmer_id:
+        bump_farmer_deliveries({before.farmer_id: -1, instance.farmer_id: 1})
+
+
+@receiver(post_delete, sender=Delivery)
+def decrement_farmer_deliveries(sender, instance, **kwargs):
+    # A no-op when the farmer itself is being deleted
+    bump_farmer_deliveries({instance.farmer_id: -1})
+
+
+# Collection names as routed in api/urls.py. Delivery writes can also move
+# warehouse occupancy and farmer counts, so they bump those collections too.
+USER_COLLECTIONS = {
+    Farmer: ('farmers',),
+    Land: ('lands',),
+    Warehouse: ('warehouses',),
+    Delivery: ('deliveries', 'warehouses', 'farmers'),
+    Payment: ('payments',),
+}
+GLOBAL_COLLECTIONS = {
+    Product: ('products',),
+    Price: ('prices',),
+}
+
+
+def remember_owner(sender, instance, **kwargs):
+    # A cascade can delete the parent before its children when the foreign
+    # key is nullable (Payment.delivery), so resolve the owner up front.
+    instance._deleted_owner_id = owner_id(instance)
+
+
+def bump_collection_versions(sender, instance, **kwargs):
+    if sender in GLOBAL_COLLECTIONS:
+        bump_versions((name, None) for name in GLOBAL_COLLECTIONS[sender])
+    else:
+        user_id = owner_id(instance)
+        bump_versions((name, user_id) for name in USER_COLLECTIONS[sender])
+
+
+def record_tombstone(sender, instance, **kwargs):
+    # Lets ?since= syncs report the deletion (api.sync)
+    user_id = None if sender in GLOBAL_COLLECTIONS else owner_id(instance)
+    Tombstone.objects.create(
+        collection=sender._meta.model_name, object_id=str(instance.pk), user_id=user_id
+    )
+
+
+# Only for these senders: a delete receiver on any other model would turn
+# off Django's fast delete for it (one DELETE instead of a row-by-row cascade).
+for model in USER_COLLECTIONS:
+    pre_delete.connect(remember_owner, sender=model)
+for model in (*USER_COLLECTIONS, *GLOBAL_COLLECTIONS):
+    post_save.connect(bump_collection_versions, sender=model)
+    post_delete.connect(bump_collection_versions, sender=model)
+    post_delete.connect(record_tombstone, sender=model)
+
+
+@receiver(connection_created)
+def install_query_recorder(sender, connection, **kwargs):
+    """
+    Count every query into the current request's metrics. Installed on the
+    connection itself (not per request) so queries run in sync_to_async
+    threads, which use their own connections, are counted as well.
+    """
+    if metrics.record_query not in connection.execute_wrappers:
+        # First, so execute_wrapper() blocks opened before the connection pop their own
+        connection.execute_wrappers.insert(0, metrics.record_query)
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    """Apply settings.SQLITE_PRAGMAS (the SQLITE_PROFILE=1 profile) to a new SQLite connection"""
+    if connection.vendor != 'sqlite' or not settings.SQLITE_PRAGMAS:
+        return
+    # On the sqlite3 connection itself, so they aren't counted as the request's queries
+    for name, value in settings.SQLITE_PRAGMAS.items():
+        connection.connection.execute(f'PRAGMA {name} = {value}')
+
+
+@receiver(post_migrate)
+def repair_search_triggers(sender, using, verbosity=1, stdout=None, **kwargs):
+    """
+    Put back the FTS5 sync triggers of migration 0009 (api.search) when a
+    later migration rebuilt agricultores or terrenos, which drops them.
+    """
+    connection = connections[using]
+    if sender.name != 'api' or connection.vendor != 'sqlite':
+        return
+    if ('api', '0009_search_index') not in MigrationRecorder(connection).applied_migrations():
+        return
+    for index in search.indexes:
+        repaired = index.repair_sqlite(connection)
+        if repaired and verbosity >= 1:
+            (stdout or sys.stdout).write(f"  Recreated {', '.join(repaired)} and rebuilt {index.fts_table}\n")
+
+
+# Runs retries and stranded jobs when JOBS_EXECUTOR is 'thread'
+request_started.connect(jobs.start_sweeper, dispatch_uid='api.jobs.start_sweeper')
+# Picks up location writes made by other processes
+request_started.connect(gazetteer.revalidate, dispatch_uid='api.gazetteer.revalidate')
@@ -0,0 +1,126 @@
+"""
+Aggregations behind the dashboard and reports screens.
+
+Everything here is computed with grouped SQL so the cost does not depend on
+how many deliveries a user has accumulated.
+"""
+from datetime import datetime, time, timedelta
+
+from django.db.models import Count, Q, Sum, Value
+from django.db.models.functions import Coalesce, ExtractWeekDay, TruncDay, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from .models import Delivery, Farmer, Payment
+
+# Same labels and order as Dashboard.jsx (JavaScript's Date.getDay())
+WEEKDAY_NAMES = ['Dom', 'Lun', 'Mar', 'Mie', 'Jue', 'Vie', 'Sab']
+APPROVED_STATUSES = ('Completado', 'Almacenado')
+
+TRUNCATE = {'day': TruncDay, 'week': TruncWeek, 'month': TruncMonth}
+
+
+def dashboard_stats(user):
+    active_farmers = Farmer.objects.filter(user=user).aggregate(
+        active=Count('id', filter=Q(status='Activo'))
+    )['active']
+
+    # At most seven rows, one per weekday
+    per_weekday = (
+        Delivery.objects.filter(farmer__user=user)
+        .annotate(weekday=ExtractWeekDay('date'))
+        .values('weekday')
+        .annotate(
+            entregas=Count('id'),
+            calidad=Count('id', filter=Q(status__in=APPROVED_STATUSES)),
+            pending=Count('id', filter=Q(status='Pendiente')),
+            quality_check=Count('id', filter=Q(status='En Calidad')),
+            stored=Sum('weight', filter=Q(status='Almacenado')),
+        )
+        .order_by()
+    )
+
+    weekly = [{'name': name, 'entregas': 0, 'calidad': 0} for name in WEEKDAY_NAMES]
+    pending = quality_check = 0
+    total_stored = 0.0
+    for row in per_weekday:
+        pending += row['pending']
+        quality_check += row['quality_check']
+        total_stored += row['stored'] or 0
+        # ExtractWeekDay is 1 (Sunday) .. 7 (Saturday)
+        weekly[row['weekday'] - 1]['entregas'] = row['entregas']
+        weekly[row['weekday'] - 1]['calidad'] = row['calidad']
+
+    return {
+        'activeFarmers': active_farmers,
+        'pendingDeliveries': pending,
+        'qualityCheck': quality_check,
+        'totalStored': total_stored,
+        'weekly': weekly,
+    }
+
+
+def _period_label(start, granularity):
+    if granularity == 'day':
+        return start.date().isoformat()
+    if granularity == 'week':
+        year, week, _ = start.isocalendar()
+        return f'{year}-W{week:02d}'
+    return start.strftime('%Y-%m')
+
+
+def start_of_day(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def reports(user, date_from=None, date_to=None, granularity='month'):
+    deliveries = Delivery.objects.filter(farmer__user=user)
+    payments = Payment.objects.filter(delivery__farmer__user=user)
+    # Half-open [from, to + 1 day) range so the indexes on date stay usable
+    if date_from:
+        deliveries = deliveries.filter(date__gte=start_of_day(date_from))
+        payments = payments.filter(date__gte=start_of_day(date_from))
+    if date_to:
+        upper = start_of_day(date_to + timedelta(days=1))
+        deliveries = deliveries.filter(date__lt=upper)
+        payments = payments.filter(date__lt=upper)
+
+    rows = (
+        deliveries.annotate(period=TRUNCATE[granularity]('date'))
+        .values('period', 'status')
+        .annotate(
+            count=Count('id'),
+            weight=Sum('weight'),
+            price=Sum(Coalesce('price_per_kg', Value(0.0))),
+        )
+        .order_by('period')
+    )
+
+    delivery_count = 0
+    total_weight = price_sum = 0.0
+    series = {}
+    quality = {}
+    for row in rows:
+        weight = row['weight'] or 0
+        delivery_count += row['count']
+        total_weight += weight
+        price_sum += row['price'] or 0
+        status = row['status'] or 'Desconocido'
+        quality[status] = quality.get(status, 0) + row['count']
+        bucket = series.setdefault(
+            _period_label(row['period'], granularity), {'entregas': 0, 'cantidad': 0.0}
+        )
+        bucket['entregas'] += row['count']
+        bucket['cantidad'] += weight
+
+    total_paid = payments.aggregate(total=Sum('amount'))['total'] or 0
+    active_farmers = Farmer.objects.filter(user=user, status='Activo').count()
+
+    return {
+        'totalWeight': total_weight,
+        'totalPaid': total_paid,
+        'activeFarmers': active_farmers,
+        'avgPrice': price_sum / delivery_count if delivery_count else 0,
+        'deliveries': delivery_count,
+        'series': [{'period': period, **values} for period, values in series.items()],
+        'quality': [{'name': name, 'value': value} for name, value in quality.items()],
+    }
@@ -0,0 +1,157 @@
+"""
+Seeded synthetic dataset for benchmarks (``manage.py generate_dataset``).
+
+Everything is written with ``bulk_create`` in batches, so a 1M-delivery
+dataset takes minutes, not hours. The same seed produces the same farmers,
+lands, weights, statuses and dates; delivery ids come from the regular
+allocator. Signals don't fire for bulk inserts, so the denormalized counters
+are rebuilt at the end.
+"""
+import random
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .cache import bump_versions
+from .counters import STORED_STATUSES, rebuild_farmer_deliveries, rebuild_warehouse_occupancy
+from .ids import delivery_ids
+from .models import (
+    Delivery, Department, District, DocumentType, Farmer, IrrigationType, Land, Payment, Price,
+    Product, Province, Warehouse,
+)
+
+DISTRICTS = ['Pólvora', 'Tocache', 'Uchiza', 'Nuevo Progreso', 'Shunte']
+IRRIGATION = ['Gravedad', 'Goteo', 'Aspersión', 'Secanero']
+FIRST_NAMES = ['José', 'María', 'Juan', 'Rosa', 'Luis', 'Ana', 'Carlos', 'Lucía', 'Jorge', 'Elena']
+LAST_NAMES = ['Pérez', 'García', 'Ramírez', 'Flores', 'Torres', 'Quispe', 'Huamán', 'Díaz', 'Rojas', 'Vásquez']
+# Weighted towards finished deliveries, like a real season
+STATUSES = ['Pendiente', 'En Calidad', 'Almacenado', 'Completado', 'Completado', 'Rechazado']
+PRICES = {'A': 15.5, 'B': 14.2, 'C': 12.0}
+
+
+def _catalogs():
+    department, _ = Department.objects.get_or_create(nombre='San Martín')
+    province, _ = Province.objects.get_or_create(nombre='Tocache', departamento=department)
+    districts = [District.objects.get_or_create(nombre=name, provincia=province)[0] for name in DISTRICTS]
+    document_type, _ = DocumentType.objects.get_or_create(codigo='DNI')
+    irrigation = [IrrigationType.objects.get_or_create(nombre=name)[0] for name in IRRIGATION]
+    product, _ = Product.objects.get_or_create(name='Cacao', defaults={'variety': 'CCN-51'})
+    for quality, price in PRICES.items():
+        Price.objects.get_or_create(quality=quality, defaults={'price': price})
+    return districts, document_type, irrigation, product
+
+
+def _batches(total, size):
+    done = 0
+    while done < total:
+        yield min(size, total - done)
+        done += size
+
+
+def generate(user, farmers=10000, deliveries=1000000, warehouses=5, max_lands=3,
+             payment_ratio=0.8, days=365, seed=42, batch_size=5000, log=print):
+    """
+    Add a dataset owned by ``user``. Returns a dict of created row counts.
+
+    Each farmer gets 1..``max_lands`` lands; deliveries are spread over the
+    last ``days`` days; ``payment_ratio`` of the completed or stored
+    deliveries get a payment.
+    """
+    rng = random.Random(seed)
+    now = timezone.now()
+    districts, document_type, irrigation, product = _catalogs()
+
+    with transaction.atomic():
+        warehouse_objs = Warehouse.objects.bulk_create(
+            Warehouse(user=user, name=f'Almacén {n + 1}', type='Central', capacity=10 ** 7)
+            for n in range(warehouses)
+        )
+        first_farmer = Farmer.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+        Farmer.objects.bulk_create(
+            (
+                Farmer(
+                    user=user,
+                    name=f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {n}',
+                    document=f'{rng.randrange(10 ** 7, 10 ** 8)}',
+                    tipo_documento=document_type,
+                    distrito=rng.choice(districts),
+                )
+                for n in range(farmers)
+            ),
+            batch_size=batch_size,
+        )
+        farmer_ids = list(
+            Farmer.objects.filter(user=user, pk__gt=first_farmer).values_list('pk', flat=True)
+        )
+        Land.objects.bulk_create(
+            (
+                Land(
+                    farmer_id=farmer_id,
+                    name=f'Parcela {n + 1}',
+                    distrito=rng.choice(districts),
+                    area=round(rng.uniform(0.5, 20), 2),
+                    altitude=rng.randrange(300, 1500),
+                    tipo_riego=rng.choice(irrigation),
+                    product=product,
+                )
+                for farmer_id in farmer_ids
+                for n in range(rng.randint(1, max_lands))
+            ),
+            batch_size=batch_size,
+        )
+    lands = {}
+    for pk, farmer_id in Land.objects.filter(farmer_id__in=farmer_ids).values_list('pk', 'farmer_id'):
+        lands.setdefault(farmer_id, []).append(pk)
+    log(f"{len(farmer_ids)} farmers, {sum(map(len, lands.values()))} lands, {warehouses} warehouses")
+
+    created = payments = 0
+    for size in _batches(deliveries, batch_size):
+        batch, paid = [], []
+        for pk in delivery_ids.allocate(size):
+            farmer_id = rng.choice(farmer_ids)
+            status = rng.choice(STATUSES)
+            weight = round(rng.uniform(20, 2000), 1)
+            price = rng.choice(list(PRICES.values())) if status != 'Pendiente' else None
+            delivery = Delivery(
+                id=pk,
+                farmer_id=farmer_id,
+                land_id=rng.choice(lands[farmer_id]),
+                product=product,
+                weight=weight,
+                price_per_kg=price,
+                total_payment=round(weight * price, 2) if price else None,
+                status=status,
+                date=now - timedelta(seconds=rng.randrange(days * 24 * 60 * 60)),
+                warehouse=rng.choice(warehouse_objs),
+            )
+            batch.append(delivery)
+            if status in STORED_STATUSES and rng.random() < payment_ratio:
+                paid.append(delivery)
+        with transaction.atomic():
+            Delivery.objects.bulk_create(batch)
+            Payment.objects.bulk_create(
+                Payment(
+                    delivery=delivery,
+                    amount=delivery.total_payment,
+                    date=delivery.date + timedelta(days=rng.randint(0, 14)),
+                    method=rng.choice(['Transferencia', 'Efectivo']),
+                    reference=f'PAY-AUTO-{delivery.id}',
+                    status='Completado',
+                )
+                for delivery in paid
+            )
+        created += len(batch)
+        payments += len(paid)
+        log(f"{created}/{deliveries} deliveries")
+
+    rebuild_farmer_deliveries(farmer_ids)
+    rebuild_warehouse_occupancy()
+    bump_versions((name, user.id) for name in ('farmers', 'lands', 'warehouses', 'deliveries', 'payments', 'reports'))
+    return {
+        'farmers': len(farmer_ids),
+        'lands': sum(map(len, lands.values())),
+        'warehouses': warehouses,
+        'deliveries': created,
+        'payments': payments,
+    }
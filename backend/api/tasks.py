@@ -0,0 +1,30 @@
+"""Handlers for the background jobs queued through api.jobs."""
+from django.db import transaction
+from django.utils import timezone
+
+from .jobs import job
+from .models import Delivery, Payment
+
+
+@job('sync_delivery_payment')
+def sync_delivery_payment(delivery_id):
+    """Create the pending payment of a priced delivery, or update its amount"""
+    with transaction.atomic():
+        # Locked so two queued syncs of one delivery can't both create a payment
+        delivery = Delivery.objects.select_for_update().filter(pk=delivery_id).first()
+        # Read the current total: a later edit may have changed or cleared it
+        if delivery is None or not delivery.total_payment or delivery.total_payment <= 0:
+            return
+        payment, created = Payment.objects.get_or_create(
+            delivery=delivery,
+            defaults={
+                'amount': delivery.total_payment,
+                'date': timezone.now(),
+                'method': 'Transferencia',
+                'status': 'Pendiente',
+                'reference': f'PAY-AUTO-{delivery.id}'
+            }
+        )
+        if not created and payment.amount != delivery.total_payment:
+            payment.amount = delivery.total_payment
+            payment.save()
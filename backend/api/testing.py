@@ -0,0 +1,74 @@
+"""
+Test helpers for the api app.
+
+The query budget helpers catch N+1 regressions: a list endpoint must run the
+same number of queries whether it returns one row or a hundred.
+``assert_projection_parity`` keeps the fast list rows of ``api.projections``
+identical to what the serializers return.
+"""
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+def count_queries(client, url, params=None):
+    """Run a GET against ``url`` and return (response, captured queries)."""
+    with CaptureQueriesContext(connection) as ctx:
+        response = client.get(url, params or {})
+    if response.status_code != 200:
+        raise AssertionError(f"GET {url} returned {response.status_code}")
+    return response, ctx.captured_queries
+
+
+def assert_queries_constant(client, url, grow, sizes=(1, 10), params=None):
+    """
+    Fail if the number of queries run by ``url`` depends on its row count.
+
+    ``grow(n)`` must create ``n`` more rows visible to ``client`` at ``url``.
+    The endpoint is measured after each step in ``sizes``.
+    """
+    counts = []
+    for size in sizes:
+        grow(size)
+        _, queries = count_queries(client, url, params)
+        counts.append((size, queries))
+
+    baseline_size, baseline = counts[0]
+    for size, queries in counts[1:]:
+        if len(queries) != len(baseline):
+            sql = "\n".join(q['sql'] for q in queries)
+            raise AssertionError(
+                f"GET {url}: {len(baseline)} queries after adding {baseline_size} rows "
+                f"but {len(queries)} after adding {size} more.\n{sql}"
+            )
+    return len(baseline)
+
+
+class QueryBudgetMixin:
+    """TestCase mixin exposing the query budget checks as assertions."""
+
+    def assertQueriesConstant(self, url, grow, sizes=(1, 10), params=None):
+        return assert_queries_constant(self.client, url, grow, sizes=sizes, params=params)
+
+    def assertMaxQueries(self, url, budget, params=None):
+        _, queries = count_queries(self.client, url, params)
+        self.assertLessEqual(
+            len(queries), budget,
+            f"GET {url} ran {len(queries)} queries (budget {budget})",
+        )
+
+
+def assert_projection_parity(projection_class, serializer_class, queryset):
+    """Fail unless ``projection_class`` renders ``queryset`` exactly like the serializer."""
+    expected = [dict(row) for row in serializer_class(queryset, many=True).data]
+    actual = projection_class().rows(queryset)
+    if len(expected) != len(actual):
+        raise AssertionError(f"{projection_class.__name__}: {len(actual)} rows, expected {len(expected)}")
+    for want, got in zip(expected, actual):
+        if want != got:
+            diff = {
+                key: (want.get(key, '<missing>'), got.get(key, '<missing>'))
+                for key in want.keys() | got.keys()
+                if want.get(key, '<missing>') != got.get(key, '<missing>')
+            }
+            raise AssertionError(f"{projection_class.__name__} differs for pk {want.get('id')}: {diff}")
+    return len(actual)
@@ -1,3 +1,696 @@
-from django.test import TestCase
+import json
+import os
+import runpy
+import tempfile
+from contextlib import redirect_stdout
+from inspect import iscoroutinefunction
+from datetime import timedelta
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.contrib.sessions.models import Session
+from django.db import DatabaseError, connection, transaction
+from django.db.models.deletion import Collector
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import gazetteer, jobs, search
+from .cache import bump_version, current_versions
+from .counters import farmer_delivery_drift
+from .models import *
+from .pagination import KeysetPagination
+from .projections import DeliveryProjection, PaymentProjection
+from .serializers import DeliveryReadSerializer, PaymentSerializer
+from .sync import DeltaSync
+from .testing import QueryBudgetMixin, assert_projection_parity
+from .views import DeliveryViewSet, FarmerViewSet, PaymentViewSet, ProductViewSet
+
+
+# Jobs run at commit, and no sweeper thread reads the test database
+@override_settings(JOBS_EXECUTOR='eager')
+class APITestCase(TestCase):
+    """Logged-in client plus helpers creating rows owned by ``self.user``"""
+
+    def setUp(self):
+        # Cached lists live in the cache, not the test database
+        cache.clear()
+        self.user = User.objects.create_user('owner', password='secret')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.product = Product.objects.create(name='Cacao', variety='CCN-51')
+        self.warehouse = Warehouse.objects.create(user=self.user, name='Almacén 1', capacity=1000)
+
+    def make_farmer(self, **fields):
+        fields.setdefault('name', f'Agricultor {Farmer.objects.count()}')
+        fields.setdefault('document', str(Farmer.objects.count()))
+        return Farmer.objects.create(user=self.user, **fields)
+
+    def make_land(self, farmer=None, **fields):
+        fields.setdefault('name', f'Parcela {Land.objects.count()}')
+        return Land.objects.create(farmer=farmer or self.make_farmer(), product=self.product, **fields)
+
+    def make_delivery(self, land=None, **fields):
+        land = land or self.make_land()
+        fields.setdefault('id', f'DEL-{Delivery.objects.count() + 1000}')
+        fields.setdefault('weight', 100)
+        fields.setdefault('date', '2025-01-15T10:00:00Z')
+        fields.setdefault('warehouse', self.warehouse)
+        return Delivery.objects.create(farmer=land.farmer, land=land, product=self.product, **fields)
+
+
+class AnonymousAccessTests(APITestCase):
+    def test_collections_require_authentication(self):
+        # Legacy rows without an owner must not be served to anonymous requests
+        Farmer.objects.create(name='Sin dueño', document='1')
+        Warehouse.objects.create(name='Sin dueño')
+        anonymous = APIClient()
+        for path in ('/api/farmers/', '/api/lands/', '/api/warehouses/', '/api/deliveries/',
+                     '/api/payments/', '/api/farmers/search/?q=sin'):
+            with self.subTest(path=path):
+                self.assertEqual(anonymous.get(path).status_code, 401)
+
+    def test_owner_does_not_see_unowned_rows(self):
+        Farmer.objects.create(name='Sin dueño', document='1')
+        own = self.make_farmer()
+        response = self.client.get('/api/farmers/')
+        self.assertEqual([row['id'] for row in response.json()['data']], [own.pk])
+
+
+
+class CachedAuthenticationTests(APITestCase):
+    def bearer_client(self, user):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+        return client
+
+    def user_queries(self, client):
+        with CaptureQueriesContext(connection) as queries:
+            status_code = client.get('/api/warehouses/').status_code
+        return status_code, sum('"auth_user"' in query['sql'] for query in queries.captured_queries)
+
+    def test_user_is_loaded_once(self):
+        client = self.bearer_client(self.user)
+        self.assertEqual(self.user_queries(client), (200, 1))
+        self.assertEqual(self.user_queries(client), (200, 0))
+
+    def test_deactivated_user_is_rejected_at_once(self):
+        client = self.bearer_client(self.user)
+        self.assertEqual(client.get('/api/warehouses/').status_code, 200)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(client.get('/api/warehouses/').status_code, 401)
+
+    def test_deleted_user_is_rejected_at_once(self):
+        client = self.bearer_client(self.user)
+        self.assertEqual(client.get('/api/warehouses/').status_code, 200)
+        self.user.delete()
+        self.assertEqual(client.get('/api/warehouses/').status_code, 401)
+
+class QueryBudgetTests(QueryBudgetMixin, APITestCase):
+    """List endpoints must not run more queries as they return more rows"""
+
+    def grow_deliveries(self, n):
+        for _ in range(n):
+            delivery = self.make_delivery()
+            Payment.objects.create(delivery=delivery, amount=100, date='2025-01-16T10:00:00Z')
+
+    def test_farmers(self):
+        self.assertQueriesConstant('/api/farmers/', lambda n: [self.make_farmer() for _ in range(n)])
+
+    def test_lands(self):
+        self.assertQueriesConstant('/api/lands/', lambda n: [self.make_land() for _ in range(n)])
+
+    def test_deliveries(self):
+        self.assertQueriesConstant('/api/deliveries/', self.grow_deliveries)
+
+    def test_delivery_pages(self):
+        self.assertQueriesConstant('/api/deliveries/', self.grow_deliveries, params={'limit': 50})
+
+    def test_payments(self):
+        self.assertQueriesConstant('/api/payments/', self.grow_deliveries)
+
+    def test_warehouses(self):
+        def grow(n):
+            for i in range(n):
+                Warehouse.objects.create(user=self.user, name=f'Almacén {i}')
+
+        self.assertQueriesConstant('/api/warehouses/', grow)
+
+    def test_bootstrap(self):
+        self.assertQueriesConstant('/api/bootstrap/', self.grow_deliveries)
+
+
+
+class KeysetPaginationTests(APITestCase):
+    def walk(self, path, limit):
+        """Ids of every page's rows, following ``next`` until it is null"""
+        ids, params = [], {'limit': limit}
+        for _ in range(100):
+            response = self.client.get(path, params)
+            self.assertEqual(response.status_code, 200, response.content)
+            body = response.json()
+            ids += [row['id'] for row in body['data']]
+            if body['next'] is None:
+                return ids
+            params['cursor'] = body['next']
+        self.fail("next never became null")
+
+    def test_walks_every_delivery_once_across_tied_dates(self):
+        land = self.make_land()
+        # Page boundaries fall inside runs of equal dates: the id breaks the tie
+        for date in ['2025-01-15T10:00:00Z'] * 4 + ['2025-01-14T10:00:00Z'] * 3:
+            self.make_delivery(land=land, date=date)
+        expected = list(Delivery.objects.order_by('-date', '-pk').values_list('pk', flat=True))
+        for limit in (1, 2, 3, 7, 50):
+            with self.subTest(limit=limit):
+                self.assertEqual(self.walk('/api/deliveries/', limit), expected)
+
+    def test_undated_payments_come_last(self):
+        delivery = self.make_delivery()
+        for date in ('2025-01-16T10:00:00Z', None, '2025-01-16T10:00:00Z', None):
+            Payment.objects.create(delivery=delivery, amount=100, date=date)
+        ids = self.walk('/api/payments/', 1)
+        self.assertEqual(len(set(ids)), 4)
+        self.assertEqual(
+            [Payment.objects.get(pk=pk).date is None for pk in ids], [False, False, True, True]
+        )
+
+    def test_malformed_cursor_is_a_bad_request(self):
+        self.make_delivery()
+        encode = KeysetPagination().encode_cursor
+        cursors = ('not a cursor', 'e30', encode('yesterday', 'DEL-1'))
+        for cursor in cursors:
+            with self.subTest(cursor=cursor):
+                response = self.client.get('/api/deliveries/', {'cursor': cursor})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('cursor', response.json())
+        response = self.client.get('/api/payments/', {'cursor': encode('2025-01-16T10:00:00Z', 'one')})
+        self.assertEqual(response.status_code, 400)
+
+
+class DeltaSyncTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.land = self.make_land()
+        self.deliveries = [self.make_delivery(land=self.land) for _ in range(3)]
+        # Synced well before the token, outside its overlap window
+        Delivery.objects.update(updated_at=timezone.now() - timedelta(hours=1))
+        self.since = self.client.get('/api/deliveries/', {'since': ''}).json()['since']
+
+    def sync(self, path='/api/deliveries/', since=None):
+        response = self.client.get(path, {'since': since or self.since})
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_returns_changed_rows_and_deletions_only(self):
+        body = self.sync()
+        self.assertEqual((body['data'], body['deleted']), ([], []))
+        changed, deleted, _ = self.deliveries
+        response = self.client.patch(f'/api/deliveries/{changed.pk}/', {'notes': 'Calidad: B'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.delete(f'/api/deliveries/{deleted.pk}/').status_code, 204)
+        # Another user's deletions are not reported
+        other = User.objects.create_user('other')
+        Farmer.objects.create(user=other, name='Ajeno', document='99').delete()
+
+        body = self.sync()
+        self.assertEqual([row['id'] for row in body['data']], [changed.pk])
+        self.assertEqual(body['deleted'], [deleted.pk])
+        self.assertEqual(self.sync('/api/farmers/')['deleted'], [])
+
+    def test_cascaded_deletions_are_tombstoned(self):
+        self.assertEqual(self.client.delete(f'/api/farmers/{self.land.farmer_id}/').status_code, 204)
+        self.assertEqual(sorted(self.sync()['deleted']), sorted(d.pk for d in self.deliveries))
+        self.assertEqual(self.sync('/api/farmers/')['deleted'], [str(self.land.farmer_id)])
+        self.assertEqual(self.sync('/api/lands/')['deleted'], [str(self.land.pk)])
+
+    def test_invalid_and_expired_tokens(self):
+        token = DeltaSync().encode_token
+        expired = token(timezone.now() - timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS + 1))
+        self.assertEqual(self.client.get('/api/deliveries/', {'since': expired}).status_code, 410)
+        for since in ('not a token', token(timezone.now().replace(tzinfo=None))):
+            with self.subTest(since=since):
+                response = self.client.get('/api/deliveries/', {'since': since})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('since', response.json())
+
+
+class ListFilterTests(APITestCase):
+    def ids(self, path, params):
+        response = self.client.get(path, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return [row['id'] for row in response.json()['data']]
+
+    def test_invalid_parameters_are_bad_requests(self):
+        cases = (
+            ('/api/deliveries/', {'farmerId': 'abc'}),
+            ('/api/deliveries/', {'date_from': '15/01/2025'}),
+            ('/api/deliveries/', {'date_from': '2025-02-01', 'date_to': '2025-01-01'}),
+            ('/api/reports/', {'date_from': '2025-02-01', 'date_to': '2025-01-01'}),
+            ('/api/deliveries/', {'ordering': 'weight'}),
+            ('/api/payments/', {'ordering': 'amount'}),
+            ('/api/farmers/', {'ordering': 'document'}),
+            ('/api/deliveries/', {'ordering': 'date', 'limit': 10}),
+            ('/api/deliveries/', {'status': 'Pendiente', 'since': ''}),
+        )
+        for path, params in cases:
+            with self.subTest(path=path, params=params):
+                self.assertEqual(self.client.get(path, params).status_code, 400)
+
+    def test_filters_and_date_range(self):
+        land = self.make_land()
+        january = self.make_delivery(land=land, date='2025-01-31T23:30:00Z')
+        self.make_delivery(land=land, date='2025-02-01T00:30:00Z', status='Almacenado')
+        other = self.make_delivery(date='2025-01-10T10:00:00Z')
+        # date_to includes the whole day
+        self.assertEqual(
+            set(self.ids('/api/deliveries/', {'date_from': '2025-01-10', 'date_to': '2025-01-31'})),
+            {january.pk, other.pk},
+        )
+        self.assertEqual(
+            self.ids('/api/deliveries/', {'farmerId': land.farmer_id, 'status': 'Pendiente'}), [january.pk]
+        )
+
+    def test_orderings_break_ties_by_id(self):
+        busy, quiet, idle = self.make_farmer(), self.make_farmer(), self.make_farmer()
+        for farmer, count in ((busy, 2), (quiet, 1)):
+            for _ in range(count):
+                self.make_delivery(land=self.make_land(farmer=farmer))
+        self.assertEqual(self.ids('/api/farmers/', {'ordering': '-deliveries'}), [busy.pk, quiet.pk, idle.pk])
+        self.assertEqual(self.ids('/api/farmers/', {'ordering': 'deliveries'}), [idle.pk, quiet.pk, busy.pk])
+
+        small, large, tied = (self.make_land(farmer=idle, area=area) for area in (1.5, 8, 1.5))
+        self.assertEqual(
+            self.ids('/api/lands/', {'farmerId': idle.pk, 'ordering': 'area'}), [small.pk, tied.pk, large.pk]
+        )
+        self.assertEqual(
+            self.ids('/api/lands/', {'farmerId': idle.pk, 'ordering': '-area'}), [large.pk, tied.pk, small.pk]
+        )
+
+
+class BootstrapTests(APITestCase):
+    def test_list_parameters_do_not_reach_the_collections(self):
+        delivery = self.make_delivery(status='Almacenado')
+        response = self.client.get('/api/bootstrap/', {
+            'include': 'farmers,deliveries,payments', 'ordering': 'name', 'status': 'Pendiente', 'limit': 1,
+        })
+        self.assertEqual(response.status_code, 200, response.content)
+        data = response.json()['data']
+        self.assertEqual([row['id'] for row in data['farmers']], [delivery.farmer_id])
+        self.assertEqual([row['id'] for row in data['deliveries']], [delivery.pk])
+        self.assertEqual(data['payments'], [])
+
+class ProjectionParityTests(APITestCase):
+    """api.projections must render the list rows exactly like the serializers"""
+
+    def setUp(self):
+        super().setUp()
+        land = self.make_land(location='Pólvora')
+        self.make_delivery(land=land, price_per_kg=12.5, total_payment=1250, notes='Calidad: A')
+        # Null foreign keys: no warehouse, land or product
+        bare = self.make_delivery(land=land, warehouse=None, status='Completado', notes=None)
+        Delivery.objects.filter(pk=bare.pk).update(land=None, product=None)
+        # Typed dates outside UTC midnight, and with microseconds
+        dated = self.make_delivery(land=land, date='2025-03-01T23:59:59.123456-05:00')
+        Payment.objects.create(delivery=dated, amount=100, date='2025-03-02T08:30:00Z', method='Efectivo')
+        # Legacy payments: no date, no delivery
+        Payment.objects.create(delivery=bare, amount=None, date=None)
+        Payment.objects.create(delivery=None, amount=50, date='2025-03-03T10:00:00Z')
+
+    def test_deliveries(self):
+        queryset = Delivery.objects.select_related('farmer', 'land', 'warehouse', 'product').order_by('pk')
+        self.assertEqual(assert_projection_parity(DeliveryProjection, DeliveryReadSerializer, queryset), 3)
+
+    def test_payments(self):
+        queryset = Payment.objects.select_related('delivery__farmer').order_by('pk')
+        self.assertEqual(assert_projection_parity(PaymentProjection, PaymentSerializer, queryset), 3)
+
+
+class VersionInvalidationTests(APITestCase):
+    names = ('deliveries', 'farmers', 'warehouses', 'reports')
+
+    def versions(self):
+        return current_versions((name, self.user.id) for name in self.names)
+
+    def test_versions_follow_the_transaction(self):
+        farmer = self.make_farmer()
+        before = self.versions()
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            self.make_delivery(land=self.make_land(farmer=farmer))
+            raise RuntimeError
+        self.assertEqual(self.versions(), before)
+
+        self.make_delivery(land=self.make_land(farmer=farmer))
+        for name, old, new in zip(self.names, before, self.versions()):
+            with self.subTest(name=name):
+                self.assertNotEqual(new, old)
+
+    def test_list_etag_revalidates_after_a_write(self):
+        self.make_delivery()
+        etag = self.client.get('/api/deliveries/')['ETag']
+        # Another process, with nothing in its cache, answers the same
+        cache.clear()
+        self.assertEqual(self.client.get('/api/deliveries/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.make_delivery()
+        response = self.client.get('/api/deliveries/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['data']), 2)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+    def test_unrelated_models_keep_fast_delete(self):
+        # Receivers without a sender would make every delete a row-by-row cascade
+        for model in (Job, Tombstone, Version, Session):
+            with self.subTest(model=model.__name__):
+                self.assertTrue(Collector(using='default').can_fast_delete(model.objects.all()))
+
+
+
+class CatalogCacheTests(APITestCase):
+    def get_prices(self, client=None):
+        response = (client or self.client).get('/api/prices/')
+        self.assertEqual(response.status_code, 200)
+        return response['X-Cache'], [(row['quality'], row['price']) for row in response.json()['data']]
+
+    def test_price_list_is_cached_until_a_price_changes(self):
+        Price.objects.create(quality='Primera', price=10)
+        self.assertEqual(self.get_prices(), ('MISS', [('Primera', 10)]))
+        self.assertEqual(self.get_prices(), ('HIT', [('Primera', 10)]))
+        # Catalogs are global: one entry serves every user
+        other = APIClient()
+        other.force_authenticate(User.objects.create_user('other'))
+        self.assertEqual(self.get_prices(other), ('HIT', [('Primera', 10)]))
+
+        response = self.client.put('/api/prices_update', {'quality': 'Primera', 'price': 12}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get_prices(), ('MISS', [('Primera', 12)]))
+        self.assertEqual(self.get_prices(other), ('HIT', [('Primera', 12)]))
+
+    def test_partial_lists_are_not_cached(self):
+        Price.objects.create(quality='Primera', price=10)
+        self.get_prices()
+        response = self.client.get('/api/prices/', {'since': ''})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-Cache', response)
+
+class GazetteerTests(APITestCase):
+    def test_locations_follow_writes_from_other_processes(self):
+        department = Department.objects.create(nombre='Piura')
+        province = Province.objects.create(nombre='Sullana', departamento=department)
+        district = District.objects.create(nombre='Bellavista', provincia=province)
+        self.assertEqual(self.client.get('/api/locations/')['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get('/api/locations/')['X-Cache'], 'HIT')
+
+        # Another process renames it: no signal reaches this one, only the version
+        District.objects.filter(pk=district.pk).update(nombre='Marcavelica')
+        bump_version('locations')
+        response = self.client.get('/api/locations/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        districts = response.json()['data'][0]['provinces'][0]['districts']
+        self.assertEqual(districts, [{'id': district.pk, 'name': 'Marcavelica'}])
+        self.assertEqual(gazetteer.resolve('Piura', 'Sullana', 'Marcavelica'), district.pk)
+
+class DeliveryCounterTests(APITestCase):
+    """Counters follow ORM writes as well as the API's"""
+
+    def stored_kg(self, warehouse=None):
+        return Warehouse.objects.get(pk=(warehouse or self.warehouse).pk).stored_kg
+
+    def test_warehouse_occupancy_follows_orm_writes(self):
+        delivery = self.make_delivery(weight=100, status='Almacenado')
+        self.make_delivery(weight=40, status='Pendiente')
+        self.assertEqual(self.stored_kg(), 100)
+
+        other = Warehouse.objects.create(user=self.user, name='Almacén 2')
+        delivery.warehouse = other
+        delivery.weight = 80
+        delivery.save()
+        self.assertEqual((self.stored_kg(), self.stored_kg(other)), (0, 80))
+
+        delivery.delete()
+        self.assertEqual(self.stored_kg(other), 0)
+
+    def test_warehouse_occupancy_follows_api_writes(self):
+        land = self.make_land()
+        response = self.client.post('/api/deliveries/', {
+            'farmerId': land.farmer_id, 'landId': land.pk, 'product': 'Cacao', 'weight': 100,
+            'date': '2025-01-15T10:00', 'warehouseId': self.warehouse.pk,
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        url = f"/api/deliveries/{response.json()['id']}/"
+        for status, stored in (('Almacenado', 100), ('Pendiente', 0)):
+            response = self.client.patch(url, {'status': status}, format='json')
+            self.assertEqual(response.status_code, 200, response.content)
+            self.assertEqual(self.stored_kg(), stored)
+
+    def test_farmer_counts_follow_orm_writes(self):
+        land = self.make_land()
+        for _ in range(3):
+            self.make_delivery(land=land)
+        self.assertEqual(farmer_delivery_drift(), [])
+
+        delivery = Delivery.objects.first()
+        delivery.farmer = self.make_farmer()
+        delivery.save()
+        self.assertEqual(farmer_delivery_drift(), [])
+
+        Delivery.objects.first().delete()
+        self.assertEqual(farmer_delivery_drift(), [])
+        self.assertEqual(Farmer.objects.get(pk=land.farmer_id).deliveries_count, 2)
+
+
+    def test_occupancy_rebuild_invalidates_the_warehouse_list(self):
+        self.make_delivery(weight=100, status='Almacenado')
+        Warehouse.objects.update(stored_kg=0)
+        etag = self.client.get('/api/warehouses/')['ETag']
+        call_command('rebuild_warehouse_occupancy', stdout=StringIO())
+        response = self.client.get('/api/warehouses/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['data'][0]['stored_kg'], 100)
+
+    def test_count_rebuild_invalidates_the_farmer_list(self):
+        land = self.make_land()
+        self.make_delivery(land=land)
+        Farmer.objects.update(deliveries_count=0)
+        etag = self.client.get('/api/farmers/')['ETag']
+        call_command('rebuild_farmer_deliveries', stdout=StringIO())
+        response = self.client.get('/api/farmers/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['data'][0]['deliveries_count'], 1)
+
+    def test_legacy_id_rewrite_invalidates_synced_lists(self):
+        delivery = self.make_delivery(id='#00001')
+        Payment.objects.create(delivery=delivery, amount=100, date='2025-01-16T10:00:00Z')
+        since = self.client.get('/api/deliveries/', {'since': ''}).json()['since']
+        etags = {path: self.client.get(path)['ETag'] for path in ('/api/deliveries/', '/api/payments/')}
+        call_command('rewrite_legacy_delivery_ids', stdout=StringIO())
+
+        for path, etag in etags.items():
+            with self.subTest(path=path):
+                response = self.client.get(path, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+        new_id = Delivery.objects.get().pk
+        self.assertEqual(response.json()['data'][0]['delivery'], new_id)
+        changes = self.client.get('/api/deliveries/', {'since': since}).json()
+        self.assertEqual(changes['deleted'], ['#00001'])
+        self.assertEqual([row['id'] for row in changes['data']], [new_id])
+
+
+class DeliveryBulkTests(APITestCase):
+    names = ('deliveries', 'farmers', 'warehouses', 'reports')
+
+    def setUp(self):
+        super().setUp()
+        self.land = self.make_land()
+
+    def item(self, **fields):
+        return {
+            'farmerId': self.land.farmer_id, 'landId': self.land.pk, 'weight': 50,
+            'date': '2025-01-15T10:00', 'warehouseId': self.warehouse.pk, **fields,
+        }
+
+    def versions(self):
+        return current_versions((name, self.user.id) for name in self.names)
+
+    def test_reports_every_invalid_item_and_creates_nothing(self):
+        before = self.versions()
+        response = self.client.post('/api/deliveries/bulk/', [
+            self.item(), self.item(weight=None), self.item(farmerId=999999), self.item(),
+        ], format='json')
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()['errors']
+        self.assertEqual([error['index'] for error in errors], [1, 2])
+        self.assertIn('weight', errors[0]['errors'])
+        self.assertIn('farmerId', errors[1]['errors'])
+        self.assertFalse(Delivery.objects.exists())
+        self.assertEqual(self.versions(), before)
+
+    def test_rolls_back_when_a_write_fails(self):
+        before = self.versions()
+        with mock.patch('api.views.bump_farmer_deliveries', side_effect=DatabaseError), \
+                self.assertRaises(DatabaseError):
+            self.client.post('/api/deliveries/bulk/', [self.item(), self.item()], format='json')
+        self.assertFalse(Delivery.objects.exists())
+        self.assertEqual(Farmer.objects.get(pk=self.land.farmer_id).deliveries_count, 0)
+        self.assertEqual(self.versions(), before)
+
+    def test_counters_and_versions_are_bumped_once_per_batch(self):
+        before = self.versions()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/deliveries/bulk/', [self.item() for _ in range(5)], format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(len(response.json()['data']), 5)
+
+        statements = [query['sql'] for query in queries.captured_queries]
+        self.assertEqual(sum(sql.startswith('UPDATE "agricultores"') for sql in statements), 1)
+        self.assertEqual(sum(sql.startswith('INSERT INTO "versiones"') for sql in statements), 1)
+        self.assertEqual(Farmer.objects.get(pk=self.land.farmer_id).deliveries_count, 5)
+        self.assertEqual(farmer_delivery_drift(), [])
+        for name, old, new in zip(self.names, before, self.versions()):
+            with self.subTest(name=name):
+                self.assertNotEqual(new, old)
+
+class ExportStreamingTests(APITestCase):
+    @mock.patch('api.exports.FLUSH_EVERY', 1)
+    async def test_asgi_export_streams_asynchronously(self):
+        for _ in range(3):
+            await sync_to_async(self.make_delivery)()
+        token = str(AccessToken.for_user(self.user))
+        response = await self.async_client.get(
+            '/api/deliveries/export/', {'format': 'ndjson'}, headers={'Authorization': f'Bearer {token}'}
+        )
+        self.assertEqual(response.status_code, 200)
+        # An async iterator, not a generator Django would buffer into a list
+        self.assertTrue(response.is_async)
+        chunks = [chunk async for chunk in response.streaming_content]
+        self.assertEqual(len(chunks), 3)
+
+
+
+class AsyncViewTests(APITestCase):
+    """The ASGI read path (api.asyncviews) answers exactly like the WSGI one"""
+
+    def setUp(self):
+        super().setUp()
+        land = self.make_land()
+        for day in (15, 16, 16):
+            delivery = self.make_delivery(land=land, date=f'2025-01-{day}T10:00:00Z')
+            Payment.objects.create(delivery=delivery, amount=100, date='2025-01-17T10:00:00Z')
+
+    def request(self, path, params=None, **headers):
+        request = APIRequestFactory().get(path, params, **headers)
+        force_authenticate(request, user=self.user)
+        return request
+
+    def body(self, response):
+        body = json.loads(response.render().content)
+        # ?since= answers carry the time of the request as the next token
+        if isinstance(body, dict):
+            body.pop('since', None)
+        return body
+
+    async def assertSameResponse(self, viewset, actions, path, params=None, **kwargs):
+        # as_view() reads the setting once, like the URLconf when it is loaded
+        sync_view = viewset.as_view(actions)
+        with override_settings(API_ASYNC_VIEWS=True):
+            async_view = viewset.as_view(actions)
+        self.assertTrue(iscoroutinefunction(async_view))
+
+        sync_response = await sync_to_async(sync_view)(self.request(path, params), **kwargs)
+        async_response = await async_view(self.request(path, params), **kwargs)
+        self.assertEqual(async_response.status_code, sync_response.status_code)
+        self.assertEqual(async_response.get('ETag'), sync_response.get('ETag'))
+        self.assertEqual(self.body(async_response), self.body(sync_response))
+
+        etag = sync_response.get('ETag')
+        if etag:
+            revalidate = self.request(path, params, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual((await async_view(revalidate, **kwargs)).status_code, 304)
+            revalidate = self.request(path, params, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual((await sync_to_async(sync_view)(revalidate, **kwargs)).status_code, 304)
+        return sync_response
+
+    async def test_lists(self):
+        cases = (
+            (DeliveryViewSet, '/api/deliveries/', {}),
+            (DeliveryViewSet, '/api/deliveries/', {'limit': 2}),
+            (DeliveryViewSet, '/api/deliveries/', {'since': ''}),
+            (PaymentViewSet, '/api/payments/', {'limit': 2}),
+            (FarmerViewSet, '/api/farmers/', {}),
+            (ProductViewSet, '/api/products/', {}),
+        )
+        for viewset, path, params in cases:
+            with self.subTest(path=path, params=params):
+                await self.assertSameResponse(viewset, {'get': 'list'}, path, params)
+
+    async def test_cursor_pages(self):
+        first = await self.assertSameResponse(DeliveryViewSet, {'get': 'list'}, '/api/deliveries/', {'limit': 2})
+        cursor = first.data['next']
+        self.assertIsNotNone(cursor)
+        await self.assertSameResponse(
+            DeliveryViewSet, {'get': 'list'}, '/api/deliveries/', {'limit': 2, 'cursor': cursor}
+        )
+
+    async def test_retrieve(self):
+        delivery = await Delivery.objects.afirst()
+        for pk in (delivery.pk, 'DEL-missing'):
+            with self.subTest(pk=pk):
+                await self.assertSameResponse(
+                    DeliveryViewSet, {'get': 'retrieve'}, f'/api/deliveries/{pk}/', pk=pk
+                )
+
+@skipUnless(connection.vendor == 'sqlite', "FTS5 index")
+class SearchIndexTests(APITestCase):
+    def test_migrate_recreates_dropped_triggers(self):
+        # What a later migration rebuilding agricultores leaves behind
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER agricultores_fts_insert')
+        farmer = self.make_farmer(name='Zoila Ñahui')
+        self.assertEqual(search.farmers.search(self.user.id, 'nahui', 5), [])
+
+        call_command('migrate', verbosity=0)
+        self.assertEqual(search.farmers.search(self.user.id, 'nahui', 5), [farmer.pk])
+        farmer = self.make_farmer(name='Zoila Pérez')
+        self.assertEqual(search.farmers.search(self.user.id, 'perez', 5), [farmer.pk])
+
+
+class JobSweepTests(APITestCase):
+    def test_sweep_runs_retries_and_stranded_jobs(self):
+        delivery = self.make_delivery(total_payment=1250)
+        past = timezone.now() - timedelta(seconds=1)
+        stale = timezone.now() - timedelta(seconds=settings.JOBS_LOCK_TIMEOUT + 1)
+        # A failed attempt waiting for its retry, and a job left running by a dead process
+        Job.objects.create(name='sync_delivery_payment', payload={'delivery_id': delivery.pk}, run_at=past, attempts=1)
+        Job.objects.create(
+            name='sync_delivery_payment', payload={'delivery_id': delivery.pk}, run_at=past,
+            status=Job.RUNNING, locked_at=stale, attempts=1,
+        )
+        inline = mock.Mock(submit=lambda func, pk: jobs.run(pk))
+        with mock.patch('api.jobs._get_executor', return_value=inline):
+            self.assertEqual(len(jobs.sweep()), 2)
+        self.assertFalse(Job.objects.exists())
+        self.assertEqual(Payment.objects.get(delivery=delivery).amount, 1250)
+
+
+class BenchmarkSmokeTests(APITestCase):
+    def test_api_endpoints_benchmark_runs(self):
+        Payment.objects.create(delivery=self.make_delivery(), amount=100, date='2025-01-16T10:00:00Z')
+        benchmark = runpy.run_path(os.path.join(settings.BASE_DIR, 'benchmarks', 'api_endpoints.py'))
+        with tempfile.TemporaryDirectory() as workdir:
+            output = os.path.join(workdir, 'results.json')
+            argv = ['api_endpoints.py', '--username', 'owner', '--repeat', '1', '--warmup', '0', '--output', output]
+            with mock.patch('sys.argv', argv), redirect_stdout(StringIO()):
+                benchmark['main']()
+            with open(output) as f:
+                results = json.load(f)['endpoints']
+        self.assertIn('deliveries detail', results)
+        self.assertEqual({name: row['status'] for name, row in results.items() if row['status'] != 200}, {})
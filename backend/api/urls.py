@@ -20,6 +20,12 @@ urlpatterns = [
     path('token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('register/', RegisterView.as_view(), name='auth_register'),
+    path('dashboard/stats/', DashboardStatsView.as_view(), name='dashboard_stats'),
+    path('reports/', ReportsView.as_view(), name='reports'),
+    path('bootstrap/', BootstrapView.as_view(), name='bootstrap'),
+    path('locations/', LocationsView.as_view(), name='locations'),
+    path('cache/stats/', CacheStatsView.as_view(), name='cache_stats'),
+    path('_metrics/', MetricsView.as_view(), name='metrics'),
     # Custom route for price update if needed to match `PUT /api/prices` without ID
     # Note: DRF Router doesn't handle PUT on base collection easily. 
     # We might handle it manually or accept that frontend must change or use a specific implementation.
@@ -1,18 +1,204 @@
+import hashlib
+import logging
+from collections import Counter
+from asgiref.sync import sync_to_async
 from rest_framework import viewsets, status, generics
+from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import AllowAny
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
+from rest_framework.views import APIView
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.http import Http404
+from django.utils import timezone
+from django.utils.http import parse_etags
 from .models import *
 from .serializers import *
+from . import gazetteer, search
+from .asyncviews import AsyncReadMixin
+from .authentication import request_user_id
+from .exports import CSVRenderer, NDJSONRenderer, export_response
+from .filters import QueryParamFilter
+from .pagination import KeysetPagination
+from .projections import DeliveryProjection, PaymentProjection
+from .signals import USER_COLLECTIONS
+from .sync import DeltaSync
+from .stats import dashboard_stats, reports
+from .cache import bump_versions, cache_stats, current_version, current_versions, get_or_build
+from .counters import apply_stored_change, bump_farmer_deliveries, stored_load
+from .ids import delivery_ids
+from .jobs import enqueue
+from . import metrics
+
+logger = logging.getLogger(__name__)
 
 class RegisterView(generics.CreateAPIView):
     queryset = User.objects.all()
     permission_classes = (AllowAny,)
     serializer_class = RegisterSerializer
 
-class BaseViewSet(viewsets.ModelViewSet):
+class DashboardStatsView(APIView):
+    """KPIs and weekly chart for the dashboard, aggregated in the database"""
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request):
+        return Response(dashboard_stats(request.user))
+
+class ReportsView(APIView):
+    """Report totals and series for a date window, cached until the user's data changes"""
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request):
+        params = ReportQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        query = params.validated_data
+
+        key = 'api:reports:{}:{}:{}:{}:{}'.format(
+            request.user.id,
+            current_version('reports', request.user.id),
+            query.get('date_from') or '',
+            query.get('date_to') or '',
+            query['granularity'],
+        )
+        data, _ = get_or_build(
+            'reports', key, lambda: reports(request.user, **query), settings.REPORTS_CACHE_TIMEOUT
+        )
+        return Response(data)
+
+class LocationsView(APIView):
+    """Department > province > district catalog for the location pickers"""
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request):
+        key = 'api:locations:{}'.format(current_version('locations'))
+        data, hit = get_or_build(
+            'locations', key, lambda: {"data": gazetteer.tree()}, settings.CATALOG_CACHE_TIMEOUT
+        )
+        return Response(data, headers={'X-Cache': 'HIT' if hit else 'MISS'})
+
+class MetricsView(APIView):
+    """Per-route latency histograms of this worker process (DELETE resets them)"""
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        return Response({"data": {"routes": metrics.snapshot(), "caches": cache_stats()}})
+
+    def delete(self, request):
+        metrics.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+class CacheStatsView(APIView):
+    """Hit/miss counters of the response caches in this worker process"""
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        return Response({"data": cache_stats()})
+
+class BaseViewSet(AsyncReadMixin, viewsets.ModelViewSet):
     """Base viewset to wrap list responses in 'data' key for legacy compatibility"""
+    # Querysets are scoped to the token's user: anonymous requests would match unowned rows
+    permission_classes = (IsAuthenticated,)
+    # Opt-in cursor mode (?cursor=&limit=), only for viewsets that set it
+    keyset_pagination_class = None
+    # ?since=<token> returns only what changed (see api.sync)
+    delta_sync_class = DeltaSync
+    # Collections whose writes can change this list: (name, per_user). Their
+    # versions (bumped by api.signals) make up the list's ETag.
+    version_collections = ()
+    # Seconds a plain list response is kept in the cache, or None to never
+    # cache it. Only for global catalogs: the key is shared by all users.
+    list_cache_timeout = None
+    # Builds list rows from values_list() instead of the serializer (api.projections)
+    projection_class = None
+    # Allowed ?status=&date_from=&ordering=... filters (api.filters)
+    filter_backends = (QueryParamFilter,)
+    query_serializer_class = None
+
     def list(self, request, *args, **kwargs):
+        etag = self.list_etag(request)
+        if etag and etag in parse_etags(request.headers.get('If-None-Match', '')):
+            # Nothing changed: skip the queryset and the serializer entirely
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=self.etag_headers(etag))
+        with metrics.measure_serialization():
+            if self.list_cache_timeout is not None and not self.is_partial_list(request):
+                response = self.cached_list(request, *args, **kwargs)
+            else:
+                response = self.uncached_list(request, *args, **kwargs)
+        if etag:
+            for header, value in self.etag_headers(etag).items():
+                response[header] = value
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        with metrics.measure_serialization():
+            return super().retrieve(request, *args, **kwargs)
+
+    async def alist(self, request, *args, **kwargs):
+        """list() for the ASGI path (api.asyncviews)"""
+        etag = await sync_to_async(self.list_etag)(request)
+        if etag and etag in parse_etags(request.headers.get('If-None-Match', '')):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=self.etag_headers(etag))
+        if self.list_cache_timeout is not None and not self.is_partial_list(request):
+            response = await sync_to_async(metrics.serializing(self.cached_list))(request, *args, **kwargs)
+        else:
+            response = await self.auncached_list(request, *args, **kwargs)
+        if etag:
+            for header, value in self.etag_headers(etag).items():
+                response[header] = value
+        return response
+
+    async def auncached_list(self, request, *args, **kwargs):
+        """uncached_list() reading the big collections with the async ORM"""
+        if self.delta_sync_class and self.delta_sync_class.is_requested(request):
+            return await sync_to_async(metrics.serializing(self.delta_list))(request)
+        if self.paginator is not None:
+            return await sync_to_async(metrics.serializing(self.uncached_list))(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        if self.keyset_pagination_class and self.keyset_pagination_class.is_requested(request):
+            paginator = self.keyset_pagination_class()
+            if self.projection_class:
+                projection = self.projection_class()
+                page = await paginator.apaginate_queryset(
+                    projection.values(queryset), request, row_position=projection.position
+                )
+                data = await sync_to_async(metrics.serializing(projection.build_all))(page)
+            else:
+                page = await paginator.apaginate_queryset(queryset, request)
+                data = await sync_to_async(metrics.serializing(self.serialize))(page, many=True)
+            return Response({"data": data, "next": paginator.next_cursor})
+        if self.projection_class:
+            return Response({"data": await self.projection_class().arows(queryset)})
+        instances = [instance async for instance in queryset.aiterator()]
+        data = await sync_to_async(metrics.serializing(self.serialize))(instances, many=True)
+        return Response({"data": data})
+
+    async def aretrieve(self, request, *args, **kwargs):
+        """retrieve() for the ASGI path, fetching the row with afirst()"""
+        queryset = self.filter_queryset(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            instance = await queryset.filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]}).afirst()
+        except (TypeError, ValueError, ValidationError):
+            raise Http404
+        if instance is None:
+            raise Http404(f'No {queryset.model._meta.object_name} matches the given query.')
+        self.check_object_permissions(request, instance)
+        return Response(await sync_to_async(metrics.serializing(self.serialize))(instance))
+
+    def serialize(self, instance, many=False):
+        return self.get_serializer(instance, many=many).data
+
+    def uncached_list(self, request, *args, **kwargs):
+        if self.delta_sync_class and self.delta_sync_class.is_requested(request):
+            return self.delta_list(request)
+        if self.keyset_pagination_class and self.keyset_pagination_class.is_requested(request):
+            return self.keyset_list(request)
+        if self.projection_class and self.paginator is None:
+            queryset = self.filter_queryset(self.get_queryset())
+            return Response({"data": self.projection_class().rows(queryset)})
         response = super().list(request, *args, **kwargs)
         # Verify if pagination is disabled or enabled
         if isinstance(response.data, list):
@@ -22,32 +208,134 @@ class BaseViewSet(viewsets.ModelViewSet):
         # We will disable pagination in settings or here.
         return response
 
+    def is_partial_list(self, request):
+        """True for ?since= and cursor requests, which aren't whole collections"""
+        return bool(
+            (self.delta_sync_class and self.delta_sync_class.is_requested(request))
+            or (self.keyset_pagination_class and self.keyset_pagination_class.is_requested(request))
+        )
+
+    def cached_list(self, request, *args, **kwargs):
+        digest = hashlib.sha1(
+            '|'.join([request.get_full_path(), *self.collection_versions(request)]).encode()
+        ).hexdigest()
+        key = f'api:list:{self.basename}:{digest}'
+        data, hit = get_or_build(
+            f'list:{self.basename}',
+            key,
+            lambda: self.uncached_list(request, *args, **kwargs).data,
+            self.list_cache_timeout,
+        )
+        return Response(data, headers={'X-Cache': 'HIT' if hit else 'MISS'})
+
+    def collection_versions(self, request):
+        user_id = request.user.id
+        return current_versions(
+            (name, user_id if per_user else None) for name, per_user in self.version_collections
+        )
+
+    def list_etag(self, request):
+        if not self.version_collections:
+            return None
+        raw = '|'.join([str(request.user.id), request.get_full_path(), *self.collection_versions(request)])
+        return 'W/"%s"' % hashlib.sha1(raw.encode()).hexdigest()[:20]
+
+    def etag_headers(self, etag):
+        # no-cache: the browser may keep the body but must revalidate every time
+        return {'ETag': etag, 'Cache-Control': 'private, no-cache', 'Vary': 'Authorization'}
+
+    @classmethod
+    def collection_data(cls, request):
+        """Serialized list, as a plain GET on the collection returns it under 'data'"""
+        view = cls(request=request, args=(), kwargs={}, format_kwarg=None, action='list')
+        # Not filter_queryset(): the query parameters are the caller's (?include=), not this list's
+        queryset = view.get_queryset()
+        if cls.projection_class:
+            return cls.projection_class().rows(queryset)
+        return view.get_serializer(queryset, many=True).data
+
+    def keyset_list(self, request):
+        paginator = self.keyset_pagination_class()
+        queryset = self.filter_queryset(self.get_queryset())
+        if self.projection_class:
+            projection = self.projection_class()
+            page = paginator.paginate_queryset(
+                projection.values(queryset), request, row_position=projection.position
+            )
+            data = projection.build_all(page)
+        else:
+            data = self.get_serializer(paginator.paginate_queryset(queryset, request), many=True).data
+        return Response({"data": data, "next": paginator.next_cursor})
+
+    def export_list(self, request, name):
+        """Stream the whole (filtered) collection; requires projection_class"""
+        queryset = self.filter_queryset(self.get_queryset())
+        return export_response(
+            self.projection_class(), queryset, request.accepted_renderer, name,
+            asynchronous=isinstance(request._request, ASGIRequest),
+        )
+
+    def search_response(self, request, index):
+        """Best matches of ?q= in ``index`` (an api.search.SearchIndex), at most ?limit="""
+        params = SearchQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        ids = index.search(request_user_id(request), params.validated_data['q'], params.validated_data['limit'])
+        rows = self.get_queryset().in_bulk(ids)
+        serializer = self.get_serializer([rows[pk] for pk in ids if pk in rows], many=True)
+        return Response({"data": serializer.data})
+
+    def delta_list(self, request):
+        queryset = self.filter_queryset(self.get_queryset())
+        # Deletions of per-user rows are only visible to their owner
+        user_id = request.user.id if queryset.model in USER_COLLECTIONS else None
+        rows, deleted, token = self.delta_sync_class().changes(queryset, request, user_id)
+        serializer = self.get_serializer(rows, many=True)
+        return Response({"data": serializer.data, "deleted": deleted, "since": token})
+
 class FarmerViewSet(BaseViewSet):
     queryset = Farmer.objects.all()
     serializer_class = FarmerSerializer
+    version_collections = (('farmers', True), ('locations', False))
+    query_serializer_class = FarmerQuerySerializer
 
     def get_queryset(self):
         # Filter farmers by current user
-        return Farmer.objects.filter(user=self.request.user)
+        # Location names come from the in-process gazetteer, not a join
+        return Farmer.objects.filter(user_id=request_user_id(self.request)).select_related('tipo_documento')
 
     def perform_create(self, serializer):
         # Assign current user as owner
         serializer.save(user=self.request.user)
 
+    @action(detail=False, url_path='search')
+    def search(self, request):
+        """GET /api/farmers/search/?q=perez — name or DNI/RUC prefixes, accents ignored"""
+        return self.search_response(request, search.farmers)
+
 class LandViewSet(BaseViewSet):
     queryset = Land.objects.all()
     serializer_class = LandSerializer
+    version_collections = (('lands', True), ('farmers', True), ('products', False), ('locations', False))
+    query_serializer_class = LandQuerySerializer
 
     def get_queryset(self):
         # Filter lands by farmers owned by current user
-        return Land.objects.filter(farmer__user=self.request.user)
+        return Land.objects.filter(farmer__user_id=request_user_id(self.request)).select_related(
+            'farmer', 'product', 'tipo_riego'
+        )
+
+    @action(detail=False, url_path='search')
+    def search(self, request):
+        """GET /api/lands/search/?q=polvora — name or location prefixes, accents ignored"""
+        return self.search_response(request, search.lands)
 
 class WarehouseViewSet(BaseViewSet):
     queryset = Warehouse.objects.all()
     serializer_class = WarehouseSerializer
+    version_collections = (('warehouses', True),)
 
     def get_queryset(self):
-        return Warehouse.objects.filter(user=self.request.user)
+        return Warehouse.objects.filter(user_id=request_user_id(self.request))
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
@@ -56,12 +344,16 @@ class ProductViewSet(BaseViewSet):
     # Products might be global or user specific. Assuming global for now as catalog.
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
+    version_collections = (('products', False),)
+    list_cache_timeout = settings.CATALOG_CACHE_TIMEOUT
 
 class PriceViewSet(BaseViewSet):
     # Prices might be global.
     queryset = Price.objects.all()
     serializer_class = PriceSerializer
-    
+    version_collections = (('prices', False),)
+    list_cache_timeout = settings.CATALOG_CACHE_TIMEOUT
+
     def update_price(self, request):
         quality = request.data.get('quality')
         price_val = request.data.get('price')
@@ -75,19 +367,26 @@ class PriceViewSet(BaseViewSet):
                 return Response({"error": "Price not found"}, status=404)
         return Response({"error": "Invalid data"}, status=400)
 
-from datetime import datetime
-
 class DeliveryViewSet(BaseViewSet):
     queryset = Delivery.objects.all()
+    keyset_pagination_class = KeysetPagination
+    projection_class = DeliveryProjection
+    bulk_max_items = 500
+    version_collections = (
+        ('deliveries', True), ('farmers', True), ('lands', True), ('warehouses', True), ('products', False),
+    )
+    query_serializer_class = DeliveryQuerySerializer
     # serializer_class handled by get_serializer_class
 
     def dispatch(self, request, *args, **kwargs):
-        print(f"DEBUG: DeliveryViewSet dispatch. Method: {request.method}, Path: {request.path}, Args: {args}, Kwargs: {kwargs}")
+        logger.debug("DeliveryViewSet dispatch %s %s %s", request.method, request.path, kwargs)
         return super().dispatch(request, *args, **kwargs)
 
     def get_queryset(self):
         # Filter deliveries by user's farmers
-        return Delivery.objects.filter(farmer__user=self.request.user).order_by('-date')
+        return Delivery.objects.filter(farmer__user_id=request_user_id(self.request)).select_related(
+            'farmer', 'land', 'warehouse', 'product'
+        ).order_by('-date')
     
     def get_serializer_class(self):
         if self.action == 'create':
@@ -96,30 +395,109 @@ class DeliveryViewSet(BaseViewSet):
             return DeliveryUpdateSerializer
         return DeliveryReadSerializer
 
+    @action(
+        detail=False, url_path='export',
+        renderer_classes=[CSVRenderer, NDJSONRenderer], permission_classes=[IsAuthenticated],
+    )
+    def export(self, request):
+        """GET /api/deliveries/export/?format=csv|ndjson"""
+        return self.export_list(request, 'entregas')
+
+    def perform_create(self, serializer):
+        # Warehouse occupancy and the farmer's count follow in the same transaction (api.signals)
+        with transaction.atomic():
+            serializer.save()
+
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk(self, request):
+        """Create a batch of deliveries in one transaction (busy collection days)"""
+        items = request.data
+        if not isinstance(items, list) or not items:
+            return Response({"error": "Expected a non-empty list of deliveries"}, status=400)
+        if len(items) > self.bulk_max_items:
+            return Response({"error": f"At most {self.bulk_max_items} deliveries per request"}, status=400)
+
+        context = self.get_serializer_context()
+        context['prefetched'] = DeliveryBulkItemSerializer.prefetch(items)
+        valid, errors = [], []
+        for index, item in enumerate(items):
+            serializer = DeliveryBulkItemSerializer(data=item, context=context)
+            if serializer.is_valid():
+                valid.append(serializer)
+            else:
+                errors.append({"index": index, "errors": serializer.errors})
+        # All or nothing, so a retried batch never creates half the sacks twice
+        if errors:
+            return Response({"errors": errors}, status=400)
+
+        defaults = DeliveryDefaults()
+        ids = delivery_ids.allocate(len(valid))
+        deliveries = [serializer.build(defaults, pk) for serializer, pk in zip(valid, ids)]
+        with transaction.atomic():
+            Delivery.objects.bulk_create(deliveries)
+            bump_farmer_deliveries(Counter(d.farmer_id for d in deliveries))
+            for delivery in deliveries:
+                apply_stored_change((None, 0), stored_load(delivery))
+            # bulk_create and update() don't send post_save
+            bump_versions((name, request.user.id) for name in ('reports', 'deliveries', 'farmers', 'warehouses'))
+
+        data = DeliveryReadSerializer(deliveries, many=True).data
+        return Response({"data": data}, status=status.HTTP_201_CREATED)
+
     def perform_update(self, serializer):
-        instance = serializer.save()
-        
-        # Auto-create payment if total_payment is set and no payment exists
-        # Usually triggers when Quality Control sets the price
-        if instance.total_payment and instance.total_payment > 0:
-            payment, created = Payment.objects.get_or_create(
-                delivery=instance,
-                defaults={
-                    'amount': instance.total_payment,
-                    'date': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                    'method': 'Transferencia',
-                    'status': 'Pendiente', 
-                    'reference': f'PAY-AUTO-{instance.id}'
-                }
-            )
-            # If payment existed but amount changed, we could update it here too if desired
-            if not created and payment.amount != instance.total_payment:
-                payment.amount = instance.total_payment
-                payment.save()
+        with transaction.atomic():
+            # Warehouse occupancy and farmer counts move with the save (api.signals)
+            instance = serializer.save()
+            # Auto-create payment if total_payment is set and no payment exists
+            # Usually triggers when Quality Control sets the price. Queued in
+            # this transaction, run after the response (api.tasks).
+            if instance.total_payment and instance.total_payment > 0:
+                enqueue('sync_delivery_payment', delivery_id=instance.pk)
 
 class PaymentViewSet(BaseViewSet):
     queryset = Payment.objects.all()
     serializer_class = PaymentSerializer
+    keyset_pagination_class = KeysetPagination
+    projection_class = PaymentProjection
+    version_collections = (('payments', True), ('deliveries', True), ('farmers', True))
+    query_serializer_class = PaymentQuerySerializer
 
     def get_queryset(self):
-        return Payment.objects.filter(delivery__farmer__user=self.request.user).order_by('-date')
+        return Payment.objects.filter(delivery__farmer__user_id=request_user_id(self.request)).select_related(
+            'delivery__farmer'
+        ).order_by('-date')
+
+    @action(
+        detail=False, url_path='export',
+        renderer_classes=[CSVRenderer, NDJSONRenderer], permission_classes=[IsAuthenticated],
+    )
+    def export(self, request):
+        """GET /api/payments/export/?format=csv|ndjson"""
+        return self.export_list(request, 'pagos')
+
+class BootstrapView(APIView):
+    """Every collection the SPA loads on start, in one request (?include= to pick some)"""
+    permission_classes = (IsAuthenticated,)
+    collections = {
+        'farmers': FarmerViewSet,
+        'lands': LandViewSet,
+        'deliveries': DeliveryViewSet,
+        'warehouses': WarehouseViewSet,
+        'prices': PriceViewSet,
+        'payments': PaymentViewSet,
+        'products': ProductViewSet,
+    }
+
+    def get(self, request):
+        include = request.query_params.get('include')
+        names = [name.strip() for name in include.split(',') if name.strip()] if include else list(self.collections)
+        unknown = [name for name in names if name not in self.collections]
+        if unknown:
+            return Response(
+                {"error": f"Unknown collections: {', '.join(unknown)}", "allowed": list(self.collections)},
+                status=400,
+            )
+        # Offline clients continue from here with ?since= on each collection
+        since = DeltaSync().encode_token(timezone.now())
+        data = {name: self.collections[name].collection_data(request) for name in names}
+        return Response({"data": data, "since": since})
@@ -0,0 +1,190 @@
+"""
+Latency and query-count benchmark of every API endpoint.
+
+Runs each endpoint of the router in api/urls.py (list and detail), plus the
+dashboard, reports, locations and bootstrap views, through Django's test
+client as the dataset owner, and records p50/p95 latency and the number of
+SQL queries. Results are written as JSON so runs can be compared. Run from
+backend/ against a database filled by ``generate_dataset``:
+
+    export SQLITE_PATH=bench.sqlite3
+    python manage.py migrate
+    python manage.py generate_dataset --farmers 10000 --deliveries 1000000
+    python benchmarks/api_endpoints.py --output before.json
+    ... change something ...
+    python benchmarks/api_endpoints.py --output after.json --compare before.json
+
+Collections with keyset pagination are measured on their first page
+(?limit=50); add --full-lists to also time the unpaginated lists.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'agrosync_backend.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.contrib.auth.models import User  # noqa: E402
+from django.core.cache import cache  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+from rest_framework.request import Request  # noqa: E402
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate  # noqa: E402
+
+from api.models import Delivery, Farmer, Land, Payment  # noqa: E402
+from api.urls import router  # noqa: E402
+
+EXTRA_ENDPOINTS = [
+    ('dashboard stats', '/api/dashboard/stats/', {}),
+    ('reports (month)', '/api/reports/', {}),
+    ('reports (week, 90 days)', '/api/reports/', {'granularity': 'week', 'date_from': '{days_ago_90}'}),
+    ('locations', '/api/locations/', {}),
+    ('bootstrap (catalogs)', '/api/bootstrap/', {'include': 'farmers,lands,warehouses,prices,products'}),
+]
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def endpoints(user, full_lists):
+    """(name, url, params) for every router collection and its first row."""
+    # Authenticated like the client below: the querysets are scoped to the token's user
+    raw = APIRequestFactory().get('/')
+    force_authenticate(raw, user=user)
+    request = Request(raw)
+    result = []
+    for prefix, viewset, _ in router.registry:
+        view = viewset(request=request, args=(), kwargs={}, format_kwarg=None, action='list')
+        queryset = view.get_queryset()
+        if viewset.keyset_pagination_class:
+            result.append((f'{prefix} list (first 50)', f'/api/{prefix}/', {'limit': 50}))
+        if full_lists or not viewset.keyset_pagination_class:
+            result.append((f'{prefix} list', f'/api/{prefix}/', {}))
+        pk = queryset.values_list('pk', flat=True).first()
+        if pk is not None:
+            result.append((f'{prefix} detail', f'/api/{prefix}/{pk}/', {}))
+    days_ago_90 = (date.today() - timedelta(days=90)).isoformat()
+    for name, url, params in EXTRA_ENDPOINTS:
+        params = {key: value.format(days_ago_90=days_ago_90) for key, value in params.items()}
+        result.append((name, url, params))
+    return result
+
+
+def measure(client, url, params, repeat, warmup, cold):
+    timings, queries, status, size = [], 0, None, 0
+    for run in range(warmup + repeat):
+        if cold:
+            cache.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            start = time.perf_counter()
+            response = client.get(url, params)
+            elapsed = (time.perf_counter() - start) * 1000
+        if run >= warmup:
+            timings.append(elapsed)
+            queries = len(ctx.captured_queries)
+            status = response.status_code
+            size = len(response.content)
+    return {
+        'url': url,
+        'params': params,
+        'status': status,
+        'p50_ms': round(percentile(timings, 0.5), 2),
+        'p95_ms': round(percentile(timings, 0.95), 2),
+        'mean_ms': round(statistics.mean(timings), 2),
+        'min_ms': round(min(timings), 2),
+        'max_ms': round(max(timings), 2),
+        'queries': queries,
+        'bytes': size,
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def dataset_counts(user):
+    return {
+        'farmers': Farmer.objects.filter(user=user).count(),
+        'lands': Land.objects.filter(farmer__user=user).count(),
+        'deliveries': Delivery.objects.filter(farmer__user=user).count(),
+        'payments': Payment.objects.filter(delivery__farmer__user=user).count(),
+    }
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)['endpoints']
+    print(f"\n{'endpoint':<36} {'p50 before':>10} {'p50 after':>10} {'change':>8} {'queries':>9}")
+    for name, row in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        change = (row['p50_ms'] - before['p50_ms']) / before['p50_ms'] * 100 if before['p50_ms'] else 0
+        queries = f"{before['queries']}->{row['queries']}"
+        print(f"{name:<36} {before['p50_ms']:>10.2f} {row['p50_ms']:>10.2f} {change:>+7.1f}% {queries:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--username', default='bench', help="Dataset owner (see generate_dataset)")
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--warmup', type=int, default=2)
+    parser.add_argument('--cold', action='store_true', help="Clear the cache before every request")
+    parser.add_argument('--full-lists', action='store_true', help="Also time unpaginated lists")
+    parser.add_argument('--output', help="Write the results to this JSON file")
+    parser.add_argument('--compare', help="Print p50 changes against an earlier results file")
+    args = parser.parse_args()
+
+    user = User.objects.get(username=args.username)
+    client = APIClient(HTTP_HOST='localhost')
+    client.force_authenticate(user)
+
+    results = {}
+    for name, url, params in endpoints(user, args.full_lists):
+        row = measure(client, url, params, args.repeat, args.warmup, args.cold)
+        results[name] = row
+        print(f"{name:<36} {row['status']} p50 {row['p50_ms']:>9.2f} ms  p95 {row['p95_ms']:>9.2f} ms  "
+              f"{row['queries']:>3} queries  {row['bytes']:>10} B")
+
+    report = {
+        'meta': {
+            'revision': git_revision(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'repeat': args.repeat,
+            'warmup': args.warmup,
+            'cold': args.cold,
+            'dataset': dataset_counts(user),
+        },
+        'endpoints': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,239 @@
+"""
+Concurrent read throughput of the ASGI path against the WSGI path.
+
+Drives both entry points in-process, without a server or sockets in
+between, so the difference is the request path itself:
+
+    wsgi  api/index.py's application, called from a pool of --wsgi-threads
+          threads (1: gunicorn's default sync worker or one serverless
+          instance; more: a gthread worker)
+    asgi  agrosync_backend/asgi.py's application on one event loop, with
+          the async list/retrieve views (api.asyncviews)
+
+Each mode runs in its own process (API_ASYNC_VIEWS is read at start-up).
+For every concurrency level, that many clients send GETs back to back until
+--requests have completed; throughput and latency percentiles are reported.
+A local SQLite file answers in microseconds, which hides what the async path
+is for; --db-latency adds a per-query delay like a database across the
+network. Run from backend/ against a database filled by ``generate_dataset``:
+
+    export SQLITE_PATH=bench.sqlite3
+    python benchmarks/asgi_vs_wsgi.py --concurrency 1,8,32,64 --db-latency 20
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import runpy
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_PATHS = [
+    '/api/deliveries/?limit=50',
+    '/api/payments/?limit=50',
+    '/api/farmers/',
+    '/api/warehouses/',
+]
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def summarize(concurrency, timings, statuses, seconds):
+    return {
+        'concurrency': concurrency,
+        'requests': len(timings),
+        'rps': round(len(timings) / seconds, 1),
+        'p50_ms': round(percentile(timings, 0.5), 2),
+        'p95_ms': round(percentile(timings, 0.95), 2),
+        'p99_ms': round(percentile(timings, 0.99), 2),
+        'errors': sum(status >= 400 for status in statuses),
+    }
+
+
+def run_wsgi(args, paths, token):
+    application = runpy.run_path(os.path.join(BACKEND, '..', 'api', 'index.py'))['app']
+
+    def call(path):
+        url = urlsplit(path)
+        environ = {
+            'REQUEST_METHOD': 'GET', 'PATH_INFO': url.path, 'QUERY_STRING': url.query,
+            'SERVER_NAME': 'localhost', 'SERVER_PORT': '80', 'HTTP_HOST': 'localhost',
+            'HTTP_AUTHORIZATION': f'Bearer {token}', 'SERVER_PROTOCOL': 'HTTP/1.1',
+            'wsgi.input': io.BytesIO(), 'wsgi.url_scheme': 'http', 'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True, 'wsgi.multiprocess': False, 'wsgi.run_once': False,
+        }
+        result = {}
+
+        def start_response(status, headers, exc_info=None):
+            result['status'] = int(status.split()[0])
+
+        start = time.perf_counter()
+        body = application(environ, start_response)
+        try:
+            b''.join(body)
+        finally:
+            if hasattr(body, 'close'):
+                body.close()
+        return (time.perf_counter() - start) * 1000, result['status']
+
+    results = []
+    with ThreadPoolExecutor(max_workers=args.wsgi_threads) as pool:
+        for concurrency in args.concurrency:
+            # Clients queue on the worker's threads, as they would on a socket backlog
+            queued = [paths[n % len(paths)] for n in range(args.requests)]
+            start = time.perf_counter()
+            timings, statuses = [], []
+
+            def client(offset):
+                for path in queued[offset::concurrency]:
+                    sent = time.perf_counter()
+                    _, status = pool.submit(call, path).result()
+                    timings.append((time.perf_counter() - sent) * 1000)
+                    statuses.append(status)
+
+            with ThreadPoolExecutor(max_workers=concurrency) as clients:
+                pending = [clients.submit(client, offset) for offset in range(concurrency)]
+                for future in pending:
+                    future.result()
+            results.append(summarize(concurrency, timings, statuses, time.perf_counter() - start))
+    return results
+
+
+async def asgi_call(application, path, token):
+    url = urlsplit(path)
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+        'scheme': 'http', 'path': url.path, 'raw_path': url.path.encode(),
+        'query_string': url.query.encode(), 'root_path': '',
+        'headers': [(b'host', b'localhost'), (b'authorization', f'Bearer {token}'.encode())],
+        'client': ('127.0.0.1', 1234), 'server': ('localhost', 80),
+    }
+    received = False
+    result = {'body': []}
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        # The client stays connected; Django cancels this wait when it's done
+        await asyncio.Event().wait()
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            result['status'] = message['status']
+        elif message['type'] == 'http.response.body':
+            result['body'].append(message.get('body', b''))
+
+    await application(scope, receive, send)
+    return result['status'], b''.join(result['body'])
+
+
+async def run_asgi(args, paths, token):
+    from agrosync_backend.asgi import application
+
+    results = []
+    for concurrency in args.concurrency:
+        queued = [paths[n % len(paths)] for n in range(args.requests)]
+        timings, statuses = [], []
+
+        async def client(offset):
+            for path in queued[offset::concurrency]:
+                sent = time.perf_counter()
+                status, _ = await asgi_call(application, path, token)
+                timings.append((time.perf_counter() - sent) * 1000)
+                statuses.append(status)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client(offset) for offset in range(concurrency)))
+        results.append(summarize(concurrency, timings, statuses, time.perf_counter() - start))
+    return results
+
+
+def run_mode(args):
+    sys.path.insert(0, BACKEND)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'agrosync_backend.settings')
+    import django
+
+    django.setup()
+    from django.contrib.auth.models import User
+    from rest_framework_simplejwt.tokens import AccessToken
+
+    from api.models import Delivery
+
+    if args.db_latency:
+        from django.db.backends.signals import connection_created
+
+        def network_round_trip(execute, sql, params, many, context):
+            time.sleep(args.db_latency / 1000)
+            return execute(sql, params, many, context)
+
+        def add_latency(sender, connection, **kwargs):
+            # Sent on every reconnect of the same connection object
+            if network_round_trip not in connection.execute_wrappers:
+                connection.execute_wrappers.append(network_round_trip)
+
+        connection_created.connect(add_latency, weak=False)
+
+    user = User.objects.get(username=args.username)
+    token = str(AccessToken.for_user(user))
+    paths = list(args.paths)
+    delivery_id = Delivery.objects.filter(farmer__user=user).values_list('pk', flat=True).first()
+    if delivery_id is not None:
+        paths.append(f'/api/deliveries/{delivery_id}/')
+
+    if args.mode == 'wsgi':
+        results = run_wsgi(args, paths, token)
+    else:
+        results = asyncio.run(run_asgi(args, paths, token))
+    print(json.dumps({'paths': paths, 'results': results}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--username', default='bench', help="Dataset owner (see generate_dataset)")
+    parser.add_argument('--concurrency', default='1,8,32,64',
+                        type=lambda value: [int(n) for n in value.split(',')])
+    parser.add_argument('--requests', type=int, default=400, help="Requests per concurrency level")
+    parser.add_argument('--wsgi-threads', type=int, default=1)
+    parser.add_argument('--paths', nargs='+', default=DEFAULT_PATHS)
+    parser.add_argument('--db-latency', type=float, default=0,
+                        help="Milliseconds added to every query, to stand in for a database across the network")
+    parser.add_argument('--output', help="Write both modes' results to this JSON file")
+    parser.add_argument('--mode', choices=['wsgi', 'asgi'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        return run_mode(args)
+
+    report = {}
+    for mode in ('wsgi', 'asgi'):
+        env = dict(os.environ, API_ASYNC_VIEWS='1' if mode == 'asgi' else '0', API_LOG_LEVEL='ERROR')
+        child = subprocess.run(
+            [sys.executable, __file__, '--mode', mode, *sys.argv[1:]],
+            env=env, capture_output=True, text=True, check=True,
+        )
+        report[mode] = json.loads(child.stdout.strip().splitlines()[-1])
+
+    print(f"{'clients':>7} {'wsgi req/s':>11} {'asgi req/s':>11} {'change':>8} "
+          f"{'wsgi p95':>9} {'asgi p95':>9}  errors")
+    for wsgi, asgi in zip(report['wsgi']['results'], report['asgi']['results']):
+        change = (asgi['rps'] - wsgi['rps']) / wsgi['rps'] * 100
+        print(f"{wsgi['concurrency']:>7} {wsgi['rps']:>11.1f} {asgi['rps']:>11.1f} {change:>+7.1f}% "
+              f"{wsgi['p95_ms']:>9.1f} {asgi['p95_ms']:>9.1f}  {wsgi['errors']}/{asgi['errors']}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote {args.output}")
+
+
+if __name__ == '__main__':
+    main()
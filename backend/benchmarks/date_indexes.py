@@ -0,0 +1,139 @@
+"""
+Before/after benchmark for the typed, indexed delivery and payment dates.
+
+Builds two throw-away SQLite databases with the same synthetic rows:
+
+    legacy  free-form CharField dates, no secondary indexes (migration 0004)
+    typed   normalized datetimes plus the composite indexes of 0005
+
+and times the queries behind the hot endpoints on both. Run from backend/:
+
+    python benchmarks/date_indexes.py --rows 1000000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+STATUSES = ['Pendiente', 'En Calidad', 'Almacenado', 'Completado', 'Rechazado']
+
+SCHEMA = """
+CREATE TABLE agricultores (id INTEGER PRIMARY KEY, user_id INTEGER, name TEXT, status TEXT);
+CREATE INDEX agricultores_user_id ON agricultores (user_id);
+CREATE TABLE entregas (
+    id TEXT PRIMARY KEY, farmerId INTEGER, warehouseId INTEGER,
+    weight REAL, status TEXT, date {date_type}
+);
+CREATE INDEX entregas_farmerId ON entregas (farmerId);
+CREATE INDEX entregas_warehouseId ON entregas (warehouseId);
+CREATE TABLE pagos (id INTEGER PRIMARY KEY, deliveryId TEXT, amount REAL, date {date_type});
+CREATE INDEX pagos_deliveryId ON pagos (deliveryId);
+"""
+
+TYPED_INDEXES = """
+CREATE INDEX entregas_date_id_idx ON entregas (date, id);
+CREATE INDEX entregas_farmer_date_idx ON entregas (farmerId, date);
+CREATE INDEX entregas_status_date_idx ON entregas (status, date);
+CREATE INDEX entregas_wh_status_idx ON entregas (warehouseId, status);
+CREATE INDEX pagos_date_id_idx ON pagos (date, id);
+CREATE INDEX pagos_delivery_date_idx ON pagos (deliveryId, date);
+"""
+
+# (label, sql); parameters are bound from the dict built in main()
+QUERIES = [
+    ("deliveries list (first page)",
+     "SELECT e.* FROM entregas e JOIN agricultores a ON a.id = e.farmerId "
+     "WHERE a.user_id = :user ORDER BY e.date DESC, e.id DESC LIMIT 50"),
+    ("deliveries date range (one week)",
+     "SELECT count(*), sum(e.weight) FROM entregas e JOIN agricultores a ON a.id = e.farmerId "
+     "WHERE a.user_id = :user AND e.date >= :start AND e.date < :end"),
+    ("deliveries by farmer, newest first",
+     "SELECT * FROM entregas WHERE farmerId = :farmer ORDER BY date DESC LIMIT 50"),
+    ("pending queue",
+     "SELECT * FROM entregas WHERE status = 'Pendiente' ORDER BY date DESC LIMIT 50"),
+    ("warehouse occupancy",
+     "SELECT sum(weight) FROM entregas WHERE warehouseId = :warehouse "
+     "AND status IN ('Almacenado', 'Completado')"),
+    ("payments list (first page)",
+     "SELECT p.* FROM pagos p JOIN entregas e ON e.id = p.deliveryId "
+     "JOIN agricultores a ON a.id = e.farmerId "
+     "WHERE a.user_id = :user ORDER BY p.date DESC, p.id DESC LIMIT 50"),
+]
+
+
+def legacy_date(moment, rng):
+    # The old CharField held whatever the client sent
+    return rng.choice([
+        moment.strftime('%Y-%m-%d'),
+        moment.strftime('%Y-%m-%dT%H:%M'),
+        moment.strftime('%Y-%m-%d %H:%M:%S'),
+    ])
+
+
+def build(path, typed, rows, farmers, users, seed):
+    rng = random.Random(seed)
+    db = sqlite3.connect(path)
+    db.executescript(SCHEMA.format(date_type='datetime' if typed else 'varchar(50)'))
+    db.executemany(
+        "INSERT INTO agricultores VALUES (?, ?, ?, 'Activo')",
+        ((i, i % users + 1, f'Farmer {i}') for i in range(1, farmers + 1)),
+    )
+    origin = datetime(2022, 1, 1)
+
+    def deliveries():
+        for i in range(rows):
+            moment = origin + timedelta(minutes=rng.randrange(3 * 365 * 24 * 60))
+            date = moment.strftime('%Y-%m-%d %H:%M:%S') if typed else legacy_date(moment, rng)
+            yield (f'DEL-{i}', rng.randint(1, farmers), rng.randint(1, 20),
+                   rng.uniform(20, 200), rng.choice(STATUSES), date)
+
+    db.executemany("INSERT INTO entregas VALUES (?, ?, ?, ?, ?, ?)", deliveries())
+    db.execute("INSERT INTO pagos (deliveryId, amount, date) SELECT id, weight * 10, date FROM entregas")
+    if typed:
+        db.executescript(TYPED_INDEXES)
+    db.execute("ANALYZE")
+    db.commit()
+    return db
+
+
+def timed(db, sql, params, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        db.execute(sql, params).fetchall()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--farmers', type=int, default=10_000)
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    params = {'user': 1, 'farmer': 7, 'warehouse': 3,
+              'start': '2023-06-01 00:00:00', 'end': '2023-06-08 00:00:00'}
+    with tempfile.TemporaryDirectory() as tmp:
+        results = {}
+        for label, typed in (('legacy', False), ('typed', True)):
+            start = time.perf_counter()
+            db = build(os.path.join(tmp, f'{label}.sqlite3'), typed, args.rows,
+                       args.farmers, args.users, args.seed)
+            print(f"built {label} dataset ({args.rows:,} deliveries) in {time.perf_counter() - start:.1f}s")
+            results[label] = [timed(db, sql, params, args.repeat) for _, sql in QUERIES]
+            db.close()
+
+    print(f"\n{'query':<40}{'legacy ms':>12}{'typed ms':>12}{'speedup':>10}")
+    for (name, _), before, after in zip(QUERIES, results['legacy'], results['typed']):
+        print(f"{name:<40}{before:>12.2f}{after:>12.2f}{before / max(after, 1e-6):>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,341 @@
+"""
+Load test that replays the SPA's traffic against a running server.
+
+Each virtual user behaves like a browser tab of the frontend
+(src/context/DataContext.jsx): it obtains a token from /api/token/, loads
+the seven collections in parallel (farmers, lands, deliveries, warehouses,
+prices, payments, products) and then, with some think time in between,
+registers deliveries and approves or rejects them in quality control with a
+PATCH, reloading everything every few actions. Like a browser, a user keeps
+at most six keep-alive connections to the host.
+
+Concurrency is ramped through ``--stages``; every stage reports throughput,
+latency percentiles and error rates per operation. Only the standard library
+is used, so it runs anywhere. Start a server first, e.g. from backend/:
+
+    export SQLITE_PATH=bench.sqlite3
+    python manage.py generate_dataset --farmers 1000 --deliveries 100000
+    gunicorn agrosync_backend.wsgi -w 4 &
+    python benchmarks/load_test.py --url http://127.0.0.1:8000 --stages 1,5,10,25,50
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+from datetime import datetime
+from urllib.parse import urlsplit
+
+COLLECTIONS = ['farmers', 'lands', 'deliveries', 'warehouses', 'prices', 'payments', 'products']
+# Browsers open at most six connections per host
+MAX_CONNECTIONS = 6
+
+
+class HTTPError(Exception):
+    pass
+
+
+class Connection:
+    """Minimal HTTP/1.1 keep-alive client connection"""
+
+    def __init__(self, host, port):
+        self.host, self.port = host, port
+        self.reader = self.writer = None
+        self.reusable = True
+
+    async def open(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+    async def request(self, method, path, headers, body):
+        lines = [f'{method} {path} HTTP/1.1', f'Host: {self.host}:{self.port}']
+        lines += [f'{name}: {value}' for name, value in headers.items()]
+        lines.append(f'Content-Length: {len(body)}')
+        self.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionResetError('Connection closed by server')
+        status = int(status_line.split()[1])
+        response_headers = {}
+        while True:
+            line = (await self.reader.readline()).decode('latin-1').strip()
+            if not line:
+                break
+            name, _, value = line.partition(':')
+            response_headers[name.strip().lower()] = value.strip()
+
+        if response_headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await self.reader.readline()).split(b';')[0], 16)
+                chunk = await self.reader.readexactly(size + 2)
+                if size == 0:
+                    break
+                chunks.append(chunk[:-2])
+            content = b''.join(chunks)
+        elif 'content-length' in response_headers:
+            content = await self.reader.readexactly(int(response_headers['content-length']))
+        else:
+            content = await self.reader.read()
+            self.reusable = False
+        if response_headers.get('connection', '').lower() == 'close':
+            self.reusable = False
+        return status, content
+
+
+class Stats:
+    """Latencies and outcomes of one operation in one stage"""
+
+    def __init__(self):
+        self.timings = []
+        self.errors = 0
+        self.statuses = {}
+        self.bytes = 0
+
+    def add(self, elapsed_ms, status, size):
+        self.timings.append(elapsed_ms)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        self.errors += not isinstance(status, int) or status >= 400
+        self.bytes += size
+
+    def as_dict(self, seconds):
+        timings = sorted(self.timings)
+        count = len(timings)
+
+        def percentile(fraction):
+            return round(timings[min(count - 1, int(fraction * count))], 2) if count else None
+
+        return {
+            'count': count,
+            'rps': round(count / seconds, 2),
+            'errors': self.errors,
+            'errorRate': round(self.errors / count, 4) if count else 0,
+            'p50Ms': percentile(0.5),
+            'p95Ms': percentile(0.95),
+            'p99Ms': percentile(0.99),
+            'meanMs': round(statistics.mean(timings), 2) if count else None,
+            'maxMs': round(timings[-1], 2) if count else None,
+            'bytes': self.bytes,
+            'statuses': {str(status): n for status, n in sorted(self.statuses.items(), key=str)},
+        }
+
+
+class LoadTest:
+    def __init__(self, args):
+        url = urlsplit(args.url)
+        self.host, self.port = url.hostname, url.port or 80
+        self.args = args
+        self.stage = 0
+        self.stats = [{} for _ in args.stages]
+        self.page_loads = [0] * len(args.stages)
+
+    def record(self, operation, elapsed_ms, status, size):
+        stage = self.stats[self.stage]
+        stats = stage.get(operation)
+        if stats is None:
+            stats = stage[operation] = Stats()
+        stats.add(elapsed_ms, status, size)
+
+    async def run(self):
+        users, stages = [], []
+        rng = random.Random(self.args.seed)
+        for index, concurrency in enumerate(self.args.stages):
+            self.stage = index
+            while len(users) < concurrency:
+                user = VirtualUser(self, random.Random(rng.random()))
+                users.append(asyncio.create_task(user.run()))
+            start = time.perf_counter()
+            await asyncio.sleep(self.args.stage_seconds)
+            seconds = time.perf_counter() - start
+            stages.append(self.report(index, concurrency, seconds))
+        for task in users:
+            task.cancel()
+        await asyncio.gather(*users, return_exceptions=True)
+        return stages
+
+    def report(self, index, concurrency, seconds):
+        operations = {name: stats.as_dict(seconds) for name, stats in sorted(self.stats[index].items())}
+        requests = sum(row['count'] for row in operations.values())
+        errors = sum(row['errors'] for row in operations.values())
+        summary = {
+            'users': concurrency,
+            'seconds': round(seconds, 1),
+            'requests': requests,
+            'rps': round(requests / seconds, 2),
+            'pageLoads': self.page_loads[index],
+            'errorRate': round(errors / requests, 4) if requests else 0,
+            'operations': operations,
+        }
+        print(f"\n== {concurrency} users, {seconds:.0f}s: {summary['rps']} req/s, "
+              f"{summary['pageLoads']} page loads, {summary['errorRate']:.2%} errors")
+        for name, row in operations.items():
+            print(f"  {name:<28} {row['count']:>6}  {row['rps']:>8.2f}/s  p50 {row['p50Ms']!s:>9}  "
+                  f"p95 {row['p95Ms']!s:>9}  p99 {row['p99Ms']!s:>9} ms  err {row['errorRate']:.2%}")
+        return summary
+
+
+class VirtualUser:
+    """One SPA session: login, parallel page load, creates and QC updates"""
+
+    def __init__(self, test, rng):
+        self.test, self.rng, self.args = test, rng, test.args
+        self.idle = []
+        self.slots = asyncio.Semaphore(MAX_CONNECTIONS)
+        self.token = None
+        self.lands = {}
+        self.pending = []
+
+    async def call(self, operation, method, path, payload=None):
+        """Send one request, recording it under ``operation``. Returns (status, parsed body)."""
+        headers = {'Content-Type': 'application/json', 'Accept': 'application/json'}
+        if self.token:
+            headers['Authorization'] = f'Bearer {self.token}'
+        body = json.dumps(payload).encode() if payload is not None else b''
+        async with self.slots:
+            connection = self.idle.pop() if self.idle else None
+            start = time.perf_counter()
+            try:
+                if connection is None:
+                    connection = Connection(self.test.host, self.test.port)
+                    await connection.open()
+                try:
+                    status, content = await connection.request(method, path, headers, body)
+                except (ConnectionResetError, asyncio.IncompleteReadError):
+                    # The server dropped an idle keep-alive connection; retry on a fresh one
+                    connection.close()
+                    connection = Connection(self.test.host, self.test.port)
+                    await connection.open()
+                    status, content = await connection.request(method, path, headers, body)
+            except (OSError, asyncio.IncompleteReadError, ValueError, IndexError) as exc:
+                if connection is not None:
+                    connection.close()
+                self.test.record(operation, (time.perf_counter() - start) * 1000, type(exc).__name__, 0)
+                return None, None
+            elapsed = (time.perf_counter() - start) * 1000
+            if connection.reusable:
+                self.idle.append(connection)
+            else:
+                connection.close()
+        self.test.record(operation, elapsed, status, len(content))
+        try:
+            return status, json.loads(content) if content else None
+        except ValueError:
+            return status, None
+
+    async def login(self):
+        status, data = await self.call(
+            'POST /api/token/', 'POST', '/api/token/',
+            {'username': self.args.username, 'password': self.args.password},
+        )
+        if status != 200:
+            raise HTTPError(f'Login failed with {status}')
+        self.token = data['access']
+
+    async def page_load(self):
+        """fetchData(): every collection at once"""
+        responses = await asyncio.gather(*(
+            self.call(f'GET /api/{name}/', 'GET', f'/api/{name}/') for name in COLLECTIONS
+        ))
+        self.test.page_loads[self.test.stage] += 1
+        data = dict(zip(COLLECTIONS, responses))
+        status, lands = data['lands']
+        if status == 200:
+            self.lands = {}
+            for land in lands['data']:
+                self.lands.setdefault(land['farmerId'], []).append(land['id'])
+        status, deliveries = data['deliveries']
+        if status == 200:
+            self.pending = [row['id'] for row in deliveries['data'] if row['status'] == 'Pendiente']
+
+    async def add_delivery(self):
+        if not self.lands:
+            return
+        farmer_id = self.rng.choice(list(self.lands))
+        status, data = await self.call('POST /api/deliveries/', 'POST', '/api/deliveries/', {
+            'farmerId': farmer_id,
+            'landId': self.rng.choice(self.lands[farmer_id]),
+            'product': 'Cacao',
+            'product_state': self.rng.choice(['seco', 'baba']),
+            'weight': round(self.rng.uniform(20, 1500), 1),
+            'date': datetime.now().isoformat(timespec='minutes'),
+            'notes': '',
+        })
+        if status == 201 and data and data.get('id'):
+            self.pending.append(data['id'])
+
+    async def quality_control(self):
+        delivery_id = self.pending.pop(self.rng.randrange(len(self.pending)))
+        price = self.rng.choice([15.5, 14.2, 12.0])
+        weight = round(self.rng.uniform(20, 1500), 1)
+        await self.call('PATCH /api/deliveries/<id>/', 'PATCH', f'/api/deliveries/{delivery_id}/', {
+            'status': 'Completado' if self.rng.random() < 0.9 else 'Rechazado',
+            'notes': f'Calidad: A\nHumedad: {self.rng.uniform(5, 9):.1f}%',
+            'price_per_kg': price,
+            'total_payment': round(price * weight, 2),
+        })
+
+    async def think(self):
+        await asyncio.sleep(self.args.think * self.rng.uniform(0.5, 1.5))
+
+    async def run(self):
+        try:
+            await self.think()
+            await self.login()
+            while True:
+                await self.page_load()
+                for _ in range(self.args.actions_per_load):
+                    await self.think()
+                    if self.pending and self.rng.random() < self.args.qc_ratio:
+                        await self.quality_control()
+                    else:
+                        await self.add_delivery()
+        except HTTPError as exc:
+            print(f'Virtual user stopped: {exc}')
+        finally:
+            for connection in self.idle:
+                connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--username', default='bench', help="Account every virtual user logs in as")
+    parser.add_argument('--password', default='bench')
+    parser.add_argument('--stages', default='1,5,10,25',
+                        type=lambda value: [int(n) for n in value.split(',')],
+                        help="Comma-separated concurrent users per stage")
+    parser.add_argument('--stage-seconds', type=float, default=30)
+    parser.add_argument('--think', type=float, default=1.0, help="Mean seconds between user actions")
+    parser.add_argument('--actions-per-load', type=int, default=5,
+                        help="Creates/QC updates between two full page loads")
+    parser.add_argument('--qc-ratio', type=float, default=0.5,
+                        help="Share of actions that are QC updates (when a delivery is pending)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="Write the per-stage results to this JSON file")
+    args = parser.parse_args()
+
+    stages = asyncio.run(LoadTest(args).run())
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'meta': {
+                    'url': args.url,
+                    'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                    'think': args.think,
+                    'actionsPerLoad': args.actions_per_load,
+                    'qcRatio': args.qc_ratio,
+                },
+                'stages': stages,
+            }, f, indent=2)
+        print(f"\nWrote {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,210 @@
+"""
+Write throughput of plain SQLite against the SQLITE_PROFILE=1 profile.
+
+Several clients create deliveries (POST /api/deliveries/, the scale at a
+collection center) while others load delivery pages and the dashboard, all
+through api/index.py's WSGI application from their own threads, as under a
+gthread worker. Each mode runs in its own process on its own copy of the
+dataset, since journal_mode=WAL is stored in the file. Successful creates
+per second, latency percentiles and errors ("database is locked" surfaces
+as a 500) are reported for every writer count. Run from backend/ against a
+database filled by ``generate_dataset``:
+
+    export SQLITE_PATH=bench.sqlite3
+    python benchmarks/sqlite_contention.py --writers 1,4,8,16 --readers 4
+"""
+import argparse
+import io
+import json
+import os
+import random
+import runpy
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import urlsplit
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+READ_PATHS = ['/api/deliveries/?limit=50', '/api/dashboard/stats/', '/api/farmers/']
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def wsgi_call(application, method, path, token, body=None):
+    url = urlsplit(path)
+    payload = json.dumps(body).encode() if body is not None else b''
+    environ = {
+        'REQUEST_METHOD': method, 'PATH_INFO': url.path, 'QUERY_STRING': url.query,
+        'SERVER_NAME': 'localhost', 'SERVER_PORT': '80', 'HTTP_HOST': 'localhost',
+        'HTTP_AUTHORIZATION': f'Bearer {token}', 'SERVER_PROTOCOL': 'HTTP/1.1',
+        'CONTENT_TYPE': 'application/json', 'CONTENT_LENGTH': str(len(payload)),
+        'wsgi.input': io.BytesIO(payload), 'wsgi.url_scheme': 'http', 'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True, 'wsgi.multiprocess': False, 'wsgi.run_once': False,
+    }
+    result = {}
+
+    def start_response(status, headers, exc_info=None):
+        result['status'] = int(status.split()[0])
+
+    body = application(environ, start_response)
+    try:
+        b''.join(body)
+    finally:
+        if hasattr(body, 'close'):
+            body.close()
+    return result['status']
+
+
+def run_mode(args):
+    sys.path.insert(0, BACKEND)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'agrosync_backend.settings')
+    import django
+
+    django.setup()
+    from django.contrib.auth.models import User
+    from django.db import connection
+    from rest_framework_simplejwt.tokens import AccessToken
+
+    from api.models import Land
+
+    application = runpy.run_path(os.path.join(BACKEND, '..', 'api', 'index.py'))['app']
+    user = User.objects.get(username=args.username)
+    token = str(AccessToken.for_user(user))
+    lands = list(Land.objects.filter(farmer__user=user).values_list('farmer_id', 'pk')[:500])
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA journal_mode')
+        journal_mode = cursor.fetchone()[0]
+    connection.close()
+
+    def delivery(rng):
+        farmer_id, land_id = rng.choice(lands)
+        return {
+            'farmerId': farmer_id, 'landId': land_id, 'product': 'Cacao',
+            'product_state': rng.choice(['seco', 'baba']), 'weight': round(rng.uniform(20, 1500), 1),
+            'date': datetime.now().isoformat(timespec='minutes'), 'notes': '',
+        }
+
+    results = []
+    for writers in args.writers:
+        timings, statuses, reads = [], [], []
+        remaining = [args.creates]
+        lock = threading.Lock()
+        writing = threading.Event()
+        writing.set()
+
+        def writer(seed):
+            rng = random.Random(seed)
+            while True:
+                with lock:
+                    if remaining[0] <= 0:
+                        return
+                    remaining[0] -= 1
+                sent = time.perf_counter()
+                status = wsgi_call(application, 'POST', '/api/deliveries/', token, delivery(rng))
+                timings.append((time.perf_counter() - sent) * 1000)
+                statuses.append(status)
+
+        def reader(offset):
+            n = offset
+            while writing.is_set():
+                reads.append(wsgi_call(application, 'GET', READ_PATHS[n % len(READ_PATHS)], token))
+                n += 1
+
+        with ThreadPoolExecutor(max_workers=writers + args.readers) as pool:
+            background = [pool.submit(reader, offset) for offset in range(args.readers)]
+            start = time.perf_counter()
+            for future in [pool.submit(writer, seed) for seed in range(writers)]:
+                future.result()
+            seconds = time.perf_counter() - start
+            writing.clear()
+            for future in background:
+                future.result()
+
+        results.append({
+            'writers': writers,
+            'creates': len(timings),
+            # Successful ones only: a locked database fails fast
+            'creates_per_s': round(sum(status < 400 for status in statuses) / seconds, 1),
+            'p50_ms': round(percentile(timings, 0.5), 2),
+            'p95_ms': round(percentile(timings, 0.95), 2),
+            'write_errors': sum(status >= 400 for status in statuses),
+            'reads': len(reads),
+            'read_errors': sum(status >= 400 for status in reads),
+        })
+    print(json.dumps({'journal_mode': journal_mode, 'results': results}))
+
+
+def copy_database(source, target, journal_mode):
+    """Copy ``source`` with SQLite's backup API, in the given journal mode"""
+    src, dst = sqlite3.connect(source), sqlite3.connect(target)
+    try:
+        src.backup(dst)
+        dst.execute(f'PRAGMA journal_mode={journal_mode}')
+    finally:
+        src.close()
+        dst.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--username', default='bench', help="Dataset owner (see generate_dataset)")
+    parser.add_argument('--writers', default='1,4,8,16', type=lambda value: [int(n) for n in value.split(',')],
+                        help="Concurrent delivery creators, one run per value")
+    parser.add_argument('--readers', type=int, default=4, help="Clients loading pages meanwhile")
+    parser.add_argument('--creates', type=int, default=400, help="Deliveries created per run")
+    parser.add_argument('--output', help="Write both modes' results to this JSON file")
+    parser.add_argument('--mode', choices=['default', 'profile'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        return run_mode(args)
+
+    source = os.environ.get('SQLITE_PATH', os.path.join(BACKEND, 'db.sqlite3'))
+    report = {}
+    workdir = tempfile.mkdtemp(prefix='sqlite-contention-')
+    try:
+        for mode in ('default', 'profile'):
+            path = os.path.join(workdir, f'{mode}.sqlite3')
+            # The profile's connections switch the copy to WAL themselves
+            copy_database(source, path, 'DELETE')
+            env = dict(
+                os.environ, SQLITE_PATH=path, SQLITE_PROFILE='1' if mode == 'profile' else '0',
+                API_LOG_LEVEL='CRITICAL',
+            )
+            env.pop('DATABASE_URL', None)
+            child = subprocess.run(
+                [sys.executable, __file__, '--mode', mode, *sys.argv[1:]],
+                env=env, capture_output=True, text=True, check=True,
+            )
+            report[mode] = json.loads(child.stdout.strip().splitlines()[-1])
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"journal_mode: {report['default']['journal_mode']} / {report['profile']['journal_mode']}\n")
+    print(f"{'writers':>7} {'default/s':>10} {'profile/s':>10} {'change':>8} "
+          f"{'default p95':>12} {'profile p95':>12}  write errors  read errors")
+    for default, profile in zip(report['default']['results'], report['profile']['results']):
+        change = (profile['creates_per_s'] - default['creates_per_s']) / default['creates_per_s'] * 100
+        print(f"{default['writers']:>7} {default['creates_per_s']:>10.1f} {profile['creates_per_s']:>10.1f} "
+              f"{change:>+7.1f}% {default['p95_ms']:>12.1f} {profile['p95_ms']:>12.1f}  "
+              f"{default['write_errors']:>5}/{profile['write_errors']:<6}  "
+              f"{default['read_errors']:>5}/{profile['read_errors']}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote {args.output}")
+
+
+if __name__ == '__main__':
+    main()
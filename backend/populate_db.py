@@ -1,13 +1,15 @@
 import os
 import django
 import random
-from datetime import datetime, timedelta
+from datetime import timedelta
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'agrosync_backend.settings')
 django.setup()
 
 from django.contrib.auth.models import User
+from django.utils import timezone
 from api.models import *
+from api.ids import delivery_ids
 
 def populate():
     print("Creando datos de prueba...")
@@ -106,15 +108,15 @@ def populate():
     print("Creando nuevas entregas de prueba...")
     for _ in range(5):
         day_offset = random.randint(0, 10)
-        date_str = (datetime.now() - timedelta(days=day_offset)).strftime('%Y-%m-%d')
+        delivery_date = timezone.now() - timedelta(days=day_offset)
         Delivery.objects.create(
-            id=f"#{random.randint(10000, 99999)}",
+            id=delivery_ids.allocate()[0],
             farmer=farmers[0], # Juan Perez
             land=land,
             product=prod,
             weight=random.uniform(50, 200),
             price_per_kg=15.50,
-            date=date_str,
+            date=delivery_date,
             warehouse=warehouse,
             status='Completado'
         )